@@ -0,0 +1,37 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def defer(func, *args):
+    """Выполняет func(*args) после отправки ответа на текущий запрос.
+
+    Очередь вызовов своя у каждого запроса и выполняется по сигналу
+    request_finished: WSGI-сервер закрывает ответ уже после отправки
+    тела клиенту, поэтому клиент не ждёт вызова. Вне запроса
+    (команды, shell) вызов выполняется сразу.
+    """
+    queue = getattr(_local, 'queue', None)
+    if queue is None:
+        func(*args)
+    else:
+        queue.append((func, args))
+
+
+def start_queue(**kwargs):
+    _local.queue = []
+
+
+def run_queue(**kwargs):
+    queue = getattr(_local, 'queue', None)
+    _local.queue = None
+    for func, args in queue or ():
+        # ответ уже отправлен: ошибка одного вызова не должна
+        # отменять остальные
+        try:
+            func(*args)
+        except Exception:
+            logger.exception('Ошибка отложенного вызова %r', func)
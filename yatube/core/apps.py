@@ -1,5 +1,20 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished, request_started
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .after_response import run_queue, start_queue
+        from .sqlite import configure_sqlite
+        connection_created.connect(
+            configure_sqlite, dispatch_uid='core.sqlite.configure_sqlite'
+        )
+        request_started.connect(
+            start_queue, dispatch_uid='core.after_response.start_queue'
+        )
+        request_finished.connect(
+            run_queue, dispatch_uid='core.after_response.run_queue'
+        )
@@ -0,0 +1,285 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# SQLite ограничивает число параметров в одном запросе
+MAX_PARAMS = 900
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires REAL,
+        size INTEGER NOT NULL,
+        accessed REAL NOT NULL
+    ) WITHOUT ROWID
+    """,
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    # общий размер записей поддерживается триггерами,
+    # чтобы проверка лимита не суммировала всю таблицу
+    'CREATE TABLE IF NOT EXISTS cache_size (total INTEGER NOT NULL)',
+    """
+    INSERT INTO cache_size SELECT 0
+    WHERE NOT EXISTS (SELECT 1 FROM cache_size)
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cache_size_insert AFTER INSERT ON cache
+    BEGIN UPDATE cache_size SET total = total + new.size; END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cache_size_update AFTER UPDATE OF size
+    ON cache
+    BEGIN UPDATE cache_size SET total = total + new.size - old.size; END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cache_size_delete AFTER DELETE ON cache
+    BEGIN UPDATE cache_size SET total = total - old.size; END
+    """,
+]
+UPSERT = """
+    INSERT INTO cache VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET value = excluded.value,
+        expires = excluded.expires, size = excluded.size,
+        accessed = excluded.accessed
+"""
+# целые числа в этих пределах SQLite хранит как INTEGER
+INTEGER_RANGE = range(-2 ** 63, 2 ** 63)
+ALIVE = '(expires IS NULL OR expires > ?)'
+
+
+def chunks(items, size=MAX_PARAMS):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite, общий для всех процессов сервера.
+
+    Не требует внешних сервисов: процессы открывают один файл
+    в режиме WAL, поэтому чтение не блокируется записью. Целые числа
+    хранятся как INTEGER, и incr выполняется одним UPDATE внутри
+    транзакции. При превышении OPTIONS['MAX_SIZE'] байт вытесняются
+    давно не читавшиеся записи.
+
+    Время чтения обновляется не чаще раза в ACCESS_RESOLUTION секунд,
+    чтобы частые чтения не превращались в записи.
+    """
+    ACCESS_RESOLUTION = 1
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location
+        self.max_size = options.get('MAX_SIZE', 64 * 1024 * 1024)
+        self.busy_timeout = options.get('BUSY_TIMEOUT', 5)
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        # соединение SQLite нельзя использовать после fork
+        if db is None or self._local.pid != os.getpid():
+            # autocommit: транзакции открываются явно в _write
+            db = sqlite3.connect(
+                self.location,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+            )
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+            self._local.pid = os.getpid()
+            self._write(lambda db: [db.execute(sql) for sql in SCHEMA])
+        return db
+
+    def _write(self, func):
+        """Выполняет func(db) в транзакции с блокировкой на запись."""
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(db)
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return result
+
+    @staticmethod
+    def _dump(value):
+        if type(value) is int and value in INTEGER_RANGE:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _rows(self, key, value, timeout):
+        value = self._dump(value)
+        size = len(key) + (8 if isinstance(value, int) else len(value))
+        return (
+            key, value, self.get_backend_timeout(timeout), size, time.time()
+        )
+
+    def _touch_read(self, db, keys, now):
+        stale = now - self.ACCESS_RESOLUTION
+        for batch in chunks(keys):
+            db.execute(
+                f'UPDATE cache SET accessed = ? WHERE accessed < ? '
+                f'AND key IN ({", ".join("?" * len(batch))})',
+                [now, stale, *batch],
+            )
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        row = self._db.execute(
+            f'SELECT value, accessed FROM cache WHERE key = ? AND {ALIVE}',
+            (key, now),
+        ).fetchone()
+        if row is None:
+            return default
+        if row[1] < now - self.ACCESS_RESOLUTION:
+            self._touch_read(self._db, [key], now)
+        return self._load(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        now = time.time()
+        found = {}
+        stale = []
+        for batch in chunks(list(keys)):
+            rows = self._db.execute(
+                f'SELECT key, value, accessed FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(batch))}) AND {ALIVE}',
+                [*batch, now],
+            )
+            for key, value, accessed in rows:
+                found[keys[key]] = self._load(value)
+                if accessed < now - self.ACCESS_RESOLUTION:
+                    stale.append(key)
+        if stale:
+            self._touch_read(self._db, stale, now)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        rows = [
+            self._rows(self._key(key, version), value, timeout)
+            for key, value in data.items()
+        ]
+
+        def store(db):
+            db.executemany(UPSERT, rows)
+            self._cull(db)
+        self._write(store)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        row = self._rows(self._key(key, version), value, timeout)
+
+        def insert(db):
+            db.execute(
+                f'DELETE FROM cache WHERE key = ? AND NOT {ALIVE}',
+                (row[0], row[4]),
+            )
+            added = db.execute(
+                'INSERT OR IGNORE INTO cache VALUES (?, ?, ?, ?, ?)', row
+            ).rowcount
+            self._cull(db)
+            return bool(added)
+        return self._write(insert)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        return bool(self._db.execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {ALIVE}',
+            (self.get_backend_timeout(timeout), key, now),
+        ).rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+
+        def increment(db):
+            now = time.time()
+            updated = db.execute(
+                f'UPDATE cache SET value = value + ?, accessed = ? '
+                f'WHERE key = ? AND typeof(value) = \'integer\' AND {ALIVE}',
+                (delta, now, key, now),
+            ).rowcount
+            if not updated:
+                raise ValueError(f"Key '{key}' not found")
+            return db.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)
+            ).fetchone()[0]
+        return self._write(increment)
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._db.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+
+        def delete(db):
+            for batch in chunks(keys):
+                db.execute(
+                    f'DELETE FROM cache WHERE key IN '
+                    f'({", ".join("?" * len(batch))})',
+                    batch,
+                )
+        self._write(delete)
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def _total_size(self, db):
+        return db.execute('SELECT total FROM cache_size').fetchone()[0]
+
+    def _cull(self, db):
+        """Вытесняет истёкшие и давно не читавшиеся записи сверх MAX_SIZE."""
+        if self._total_size(db) <= self.max_size:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        total = self._total_size(db)
+        if total <= self.max_size:
+            return
+        # освобождаем с запасом, чтобы не вытеснять на каждой записи
+        excess = (
+            total - self.max_size + self.max_size // self._cull_frequency
+        )
+        db.execute(
+            """
+            DELETE FROM cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (
+                        ORDER BY accessed ROWS UNBOUNDED PRECEDING
+                    ) - size AS freed
+                    FROM cache
+                ) WHERE freed < ?
+            )
+            """,
+            (excess,),
+        )
@@ -0,0 +1,95 @@
+import random
+import threading
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+# приложения, чтение которых уходит на реплики
+REPLICATED_APPS = {'posts', 'auth'}
+# cookie, закрепляющая клиента за основной базой после записи
+PIN_COOKIE = 'db_primary'
+
+_state = threading.local()
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def pin_to_primary():
+    _state.pinned = True
+
+
+def has_written():
+    return getattr(_state, 'written', False)
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', False) or has_written()
+
+
+def reset_pin():
+    _state.pinned = False
+    _state.written = False
+
+
+class ReplicaRouter:
+    """Чтение posts и auth с реплик из DATABASE_REPLICAS.
+
+    Запись всегда идёт в основную базу и закрепляет за ней поток до
+    конца запроса, чтобы последующие чтения видели записанное
+    (read-your-writes).
+    """
+
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if (
+            aliases
+            and model._meta.app_label in REPLICATED_APPS
+            and not is_pinned()
+        ):
+            return random.choice(aliases)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label in REPLICATED_APPS:
+            _state.written = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики содержат те же данные, что и основная база
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+
+class ReplicaPinMiddleware:
+    """Сбрасывает закрепление за основной базой в начале запроса.
+
+    После запроса с записью клиент получает cookie и ещё
+    REPLICA_PIN_SECONDS читает из основной базы, пока реплики
+    догоняют её: так после редиректа с формы виден новый пост.
+    """
+
+    def __init__(self, get_response):
+        if not replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+    def __call__(self, request):
+        reset_pin()
+        if request.COOKIES.get(PIN_COOKIE):
+            pin_to_primary()
+        try:
+            response = self.get_response(request)
+            written = has_written()
+        finally:
+            reset_pin()
+        if written:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=self.pin_seconds, httponly=True
+            )
+        return response
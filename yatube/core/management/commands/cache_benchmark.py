@@ -0,0 +1,113 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'filebased': 'django.core.cache.backends.filebased.FileBasedCache',
+    'sqlite': 'core.cache.SQLiteCache',
+}
+# карточка поста в кэше занимает порядка 1-2 КБ
+CARD = 'x' * 1500
+PAGE = 10
+
+
+def create_cache(name, location):
+    params = {
+        # не даём стандартным бэкендам вытеснять записи посреди замера
+        'OPTIONS': {'MAX_ENTRIES': 10 ** 6},
+        'TIMEOUT': None,
+    }
+    return import_string(BACKENDS[name])(location, params)
+
+
+def location_of(name, directory):
+    if name == 'sqlite':
+        return os.path.join(directory, 'cache.sqlite3')
+    return os.path.join(directory, name)
+
+
+def operations(cache, keys):
+    """Операции, которые делают страницы ленты: чтение карточек
+    страницы, запись отсутствующих, чтение поколения и incr."""
+    pages = [keys[i:i + PAGE] for i in range(0, len(keys), PAGE)]
+    return {
+        'set_many': lambda i: cache.set_many(
+            {key: CARD for key in pages[i % len(pages)]}
+        ),
+        'get_many': lambda i: cache.get_many(pages[i % len(pages)]),
+        'get': lambda i: cache.get(keys[i % len(keys)]),
+        'incr': lambda i: cache.incr('counter'),
+    }
+
+
+def run(name, location, iterations, keys):
+    """Замер в одном процессе; возвращает {операция: секунды}."""
+    cache = create_cache(name, location)
+    cache.set('counter', 0)
+    timings = {}
+    for operation, func in operations(cache, keys).items():
+        started = time.perf_counter()
+        for i in range(iterations):
+            func(i)
+        timings[operation] = time.perf_counter() - started
+    return timings
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает производительность бэкендов кэша '
+        'на операциях лент постов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=2000,
+            help='Сколько раз выполнить каждую операцию в процессе',
+        )
+        parser.add_argument(
+            '--keys', type=int, default=1000,
+            help='Число различных ключей',
+        )
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Сколько процессов работают с кэшем одновременно',
+        )
+        parser.add_argument(
+            '--backend', action='append', choices=BACKENDS,
+            help='Бэкенд для замера; по умолчанию все',
+        )
+
+    def handle(self, *args, iterations, keys, processes, backend, **options):
+        keys = [f'post_card:author:{i}' for i in range(keys)]
+        self.stdout.write(
+            f'{"бэкенд":<10} {"операция":<10} {"оп/с":>10} {"мкс/оп":>8}'
+        )
+        for name in backend or BACKENDS:
+            with tempfile.TemporaryDirectory() as directory:
+                location = location_of(name, directory)
+                with ProcessPoolExecutor(max_workers=processes) as executor:
+                    results = list(executor.map(
+                        run,
+                        [name] * processes,
+                        [location] * processes,
+                        [iterations] * processes,
+                        [keys] * processes,
+                    ))
+            for operation in results[0]:
+                # процессы работают параллельно: время замера — самое долгое
+                elapsed = max(timings[operation] for timings in results)
+                total = iterations * processes
+                self.stdout.write(
+                    f'{name:<10} {operation:<10} {total / elapsed:>10.0f} '
+                    f'{elapsed / iterations * 1e6:>8.1f}'
+                )
+        if processes > 1:
+            self.stdout.write(
+                'locmem у каждого процесса свой: его числа не учитывают '
+                'общий доступ к данным'
+            )
@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sqlite import apply_pragmas
+
+SCHEMA = '''
+CREATE TABLE post (
+    id INTEGER PRIMARY KEY,
+    author_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    pub_date REAL NOT NULL
+);
+CREATE INDEX post_author_idx ON post (author_id, id);
+CREATE TABLE stats (
+    author_id INTEGER PRIMARY KEY,
+    posts_count INTEGER NOT NULL
+);
+'''
+AUTHORS = 100
+TEXT = 'x' * 500
+
+
+def profiles():
+    """Профиль -> (PRAGMA, держать ли подключение между запросами)."""
+    return {
+        'stock': ({}, False),
+        'pragmas': (settings.SQLITE_PRAGMAS, False),
+        'tuned': (settings.SQLITE_PRAGMAS, True),
+    }
+
+
+def prepare(path):
+    db = sqlite3.connect(path, isolation_level=None)
+    db.executescript(SCHEMA)
+    db.executemany(
+        'INSERT INTO stats VALUES (?, 0)', [(i,) for i in range(AUTHORS)]
+    )
+    db.close()
+
+
+def connect(path, pragmas):
+    db = sqlite3.connect(path, isolation_level=None)
+    apply_pragmas(db.cursor(), pragmas)
+    return db
+
+
+def request(db, author_id):
+    """Запрос с публикацией: страница профиля и запись поста
+    со счётчиком в одной транзакции, как в PostCreateView."""
+    db.execute(
+        'SELECT id, text FROM post WHERE author_id = ? '
+        'ORDER BY id DESC LIMIT 10', (author_id,)
+    ).fetchall()
+    db.execute('BEGIN')
+    try:
+        db.execute(
+            'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)',
+            (author_id, TEXT, time.time()),
+        )
+        db.execute(
+            'UPDATE stats SET posts_count = posts_count + 1 '
+            'WHERE author_id = ?', (author_id,)
+        )
+        db.execute('COMMIT')
+    except sqlite3.OperationalError:
+        db.execute('ROLLBACK')
+        raise
+
+
+def run(path, pragmas, persistent, iterations, worker):
+    """Запросы одного процесса; возвращает (секунды, задержки, ошибки)."""
+    latencies = []
+    errors = 0
+    db = connect(path, pragmas) if persistent else None
+    started = time.perf_counter()
+    for i in range(iterations):
+        begin = time.perf_counter()
+        connection = db or connect(path, pragmas)
+        try:
+            request(connection, (worker * iterations + i) % AUTHORS)
+        except sqlite3.OperationalError:
+            errors += 1
+        finally:
+            if not persistent:
+                connection.close()
+        latencies.append(time.perf_counter() - begin)
+    return time.perf_counter() - started, latencies, errors
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность записи в SQLite '
+        'при одновременной работе нескольких процессов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=500,
+            help='Сколько запросов выполняет каждый процесс',
+        )
+        parser.add_argument(
+            '--processes', type=int, default=8,
+            help='Сколько процессов пишут одновременно',
+        )
+        parser.add_argument(
+            '--profile', action='append', choices=profiles(),
+            help='Профиль для замера; по умолчанию все',
+        )
+
+    def handle(self, *args, iterations, processes, profile, **options):
+        self.stdout.write(
+            f'{"профиль":<8} {"запр/с":>8} {"p50 мс":>7} {"p99 мс":>7} '
+            f'{"ошибки":>7}'
+        )
+        for name in profile or profiles():
+            pragmas, persistent = profiles()[name]
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                prepare(path)
+                with ProcessPoolExecutor(max_workers=processes) as executor:
+                    results = list(executor.map(
+                        run,
+                        [path] * processes,
+                        [pragmas] * processes,
+                        [persistent] * processes,
+                        [iterations] * processes,
+                        range(processes),
+                    ))
+            elapsed = max(result[0] for result in results)
+            latencies = [
+                latency for result in results for latency in result[1]
+            ]
+            errors = sum(result[2] for result in results)
+            self.stdout.write(
+                f'{name:<8} {iterations * processes / elapsed:>8.0f} '
+                f'{percentile(latencies, 0.5) * 1000:>7.2f} '
+                f'{percentile(latencies, 0.99) * 1000:>7.2f} {errors:>7}'
+            )
@@ -0,0 +1,213 @@
+import http.cookiejar
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import URLResolver, get_resolver, reverse
+
+from posts.models import Group, Post, User
+
+# пространства имён маршрутов, которые нагружает команда
+NAMESPACES = ('posts', 'users')
+# маршруты, которые вызываются POST-запросом, и данные формы
+POST_ROUTES = {
+    'posts:add_comment': {'text': 'Комментарий нагрузочного теста'},
+    'posts:api_profile_follow': {},
+    'posts:api_follow_bulk': {'authors': 'load_test_author'},
+}
+# маршруты, завершающие сессию: их вызывают анонимные клиенты
+ANONYMOUS_ROUTES = {'users:logout'}
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Замеряется сам view, а не страница, на которую он перенаправил."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def route_names():
+    """Имена всех маршрутов posts.urls и users.urls с их параметрами."""
+    for resolver in get_resolver().url_patterns:
+        if not (
+            isinstance(resolver, URLResolver)
+            and resolver.namespace in NAMESPACES
+        ):
+            continue
+        for pattern in resolver.url_patterns:
+            if pattern.name:
+                yield (
+                    f'{resolver.namespace}:{pattern.name}',
+                    list(pattern.pattern.converters),
+                )
+
+
+def sample_arguments(prefix):
+    """Значения параметров маршрутов из данных seed_content."""
+    users = list(User.objects.filter(
+        username__startswith=f'{prefix}_user_'
+    ).values_list('username', flat=True)[:1000])
+    if not users:
+        raise CommandError(
+            'Нет пользователей с префиксом {prefix}: '
+            'сначала выполните seed_content'.format(prefix=prefix)
+        )
+    posts = list(Post.objects.values_list('id', flat=True)[:1000])
+    return {
+        'username': users,
+        'slug': list(Group.objects.values_list('slug', flat=True)[:100]),
+        'pk': posts,
+        'post_id': posts,
+        'uidb64': ['MQ'],
+        'token': ['set-password'],
+    }
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Client:
+    """Браузер одного пользователя: cookie сессии и CSRF."""
+
+    def __init__(self, base_url, username=None, password=None):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), NoRedirect
+        )
+        if username:
+            self.login(username, password)
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, path, data=None):
+        """Выполняет запрос; возвращает код ответа."""
+        request = urllib.request.Request(self.base_url + path)
+        if data is not None:
+            request.data = urllib.parse.urlencode(
+                dict(data, csrfmiddlewaretoken=self.csrf_token())
+            ).encode()
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+    def login(self, username, password):
+        path = reverse('users:login')
+        self.request(path)
+        self.request(path, {'username': username, 'password': password})
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает запущенный сервер запросами ко всем маршрутам posts '
+        'и users и выводит пропускную способность и задержки по view'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url', default='http://127.0.0.1:8000',
+            help='Адрес запущенного сервера',
+        )
+        parser.add_argument(
+            '--clients', type=int, default=16,
+            help='Число одновременных клиентов',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=30,
+            help='Длительность нагрузки в секундах',
+        )
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Префикс пользователей seed_content',
+        )
+        parser.add_argument(
+            '--password', default='seed-password',
+            help='Пароль пользователей seed_content',
+        )
+        parser.add_argument(
+            '--anonymous', type=float, default=0.3,
+            help='Доля клиентов без входа на сайт',
+        )
+        parser.add_argument(
+            '--route', action='append',
+            help='Нагружать только эти маршруты, например posts:index',
+        )
+
+    def handle(self, *args, base_url, clients, duration, prefix, password,
+               anonymous, route, **options):
+        routes = [
+            (name, params) for name, params in route_names()
+            if not route or name in route
+        ]
+        if not routes:
+            raise CommandError('Нет маршрутов для нагрузки')
+        arguments = sample_arguments(prefix)
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+        deadline = time.monotonic() + duration
+
+        def work(number):
+            rng = random.Random(number)
+            user = None
+            if rng.random() >= anonymous:
+                user = rng.choice(arguments['username'])
+            client = Client(base_url, user, password)
+            guest = Client(base_url)
+            while time.monotonic() < deadline:
+                name, params = rng.choice(routes)
+                path = reverse(name, kwargs={
+                    param: rng.choice(arguments[param]) for param in params
+                })
+                browser = guest if name in ANONYMOUS_ROUTES else client
+                started = time.perf_counter()
+                try:
+                    status = browser.request(path, POST_ROUTES.get(name))
+                except OSError:
+                    status = None
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies[name].append(elapsed)
+                    if status is None or status >= 500:
+                        errors[name] += 1
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            list(executor.map(work, range(clients)))
+        elapsed = time.monotonic() - started
+        self.report(latencies, errors, elapsed)
+
+    def report(self, latencies, errors, elapsed):
+        self.stdout.write(
+            f'{"view":<32} {"запросы":>8} {"запр/с":>8} {"p50 мс":>8} '
+            f'{"p95 мс":>8} {"p99 мс":>8} {"ошибки":>7}'
+        )
+        total = 0
+        for name in sorted(latencies):
+            values = sorted(latencies[name])
+            total += len(values)
+            self.stdout.write(
+                f'{name:<32} {len(values):>8} {len(values) / elapsed:>8.1f} '
+                f'{percentile(values, 0.5) * 1000:>8.1f} '
+                f'{percentile(values, 0.95) * 1000:>8.1f} '
+                f'{percentile(values, 0.99) * 1000:>8.1f} '
+                f'{errors[name]:>7}'
+            )
+        self.stdout.write(
+            f'Всего: {total} запросов за {elapsed:.1f} с, '
+            f'{total / elapsed:.1f} запр/с'
+        )
@@ -0,0 +1,325 @@
+import bisect
+import os
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+# границы корзин гистограмм
+SECONDS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERIES_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+# метрика -> (тип, корзины, описание)
+METRICS = {
+    'request_duration_seconds': (
+        'histogram', SECONDS_BUCKETS, 'Время обработки запроса',
+    ),
+    'sql_queries': (
+        'histogram', QUERIES_BUCKETS, 'Число SQL-запросов за запрос',
+    ),
+    'sql_duration_seconds': (
+        'histogram', SECONDS_BUCKETS, 'Время SQL-запросов за запрос',
+    ),
+    'template_render_seconds': (
+        'histogram', SECONDS_BUCKETS, 'Время отрисовки шаблонов за запрос',
+    ),
+    'cache_hits_total': ('counter', None, 'Попадания в кэш'),
+    'cache_misses_total': ('counter', None, 'Промахи кэша'),
+}
+PREFIX = 'yatube_'
+# наибольший номер слота, когда-либо занятого процессом
+SLOTS_KEY = 'metrics:slots'
+UNRESOLVED = '<unresolved>'
+
+_local = threading.local()
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+
+
+class RequestStats:
+    """Замеры одного запроса, которые накапливают обёртки."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - started
+
+
+def worker_key(slot):
+    return f'metrics:worker:{slot}'
+
+
+def current_stats():
+    return getattr(_local, 'stats', None)
+
+
+class Registry:
+    """Гистограммы и счётчики процесса по имени view.
+
+    Снимок процесса время от времени записывается в общий кэш под
+    собственным номером, а /metrics/ складывает снимки всех процессов.
+    Слот живёт METRICS_SLOT_TTL секунд после последней записи. Пока
+    процесс жив, фоновый поток переписывает снимок каждые
+    METRICS_FLUSH_INTERVAL секунд и без запросов, поэтому истекают
+    только слоты завершившихся процессов, и их номера занимают новые.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.token = uuid.uuid4().hex
+        self.slot = None
+        self.flushed = 0.0
+        self.heartbeat = None
+        # (метрика, view) -> [счётчики корзин..., сумма, число] или число
+        self.values = {}
+
+    def observe(self, metric, view, value):
+        buckets = METRICS[metric][1]
+        key = (metric, view)
+        row = self.values.get(key)
+        if row is None:
+            row = self.values[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+        row[bisect.bisect_left(buckets, value)] += 1
+        row[-2] += value
+        row[-1] += 1
+
+    def add(self, metric, view, value):
+        key = (metric, view)
+        self.values[key] = self.values.get(key, 0) + value
+
+    def record(self, view, duration, stats):
+        with _lock:
+            self.observe('request_duration_seconds', view, duration)
+            self.observe('sql_queries', view, stats.queries)
+            self.observe('sql_duration_seconds', view, stats.sql_time)
+            self.observe(
+                'template_render_seconds', view, stats.template_time
+            )
+            self.add('cache_hits_total', view, stats.cache_hits)
+            self.add('cache_misses_total', view, stats.cache_misses)
+
+    def snapshot(self):
+        with _lock:
+            return {
+                key: list(value) if isinstance(value, list) else value
+                for key, value in self.values.items()
+            }
+
+    def start_heartbeat(self):
+        """Запускает поток, продлевающий слот процесса."""
+        with _flush_lock:
+            if self.heartbeat is not None:
+                return
+            self.heartbeat = threading.Thread(
+                target=self.beat, name='metrics-heartbeat', daemon=True
+            )
+        self.heartbeat.start()
+
+    def beat(self):
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        while True:
+            time.sleep(interval)
+            # реестр заменён (тесты) или процесс — потомок после fork
+            if _registry is not self or self.pid != os.getpid():
+                return
+            self.flush(force=True)
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        if not force and now - self.flushed < interval:
+            return
+        ttl = getattr(settings, 'METRICS_SLOT_TTL', 60)
+        with _flush_lock:
+            self.flushed = now
+            value = (self.token, self.snapshot())
+            owner = self.slot and cache.get(worker_key(self.slot))
+            if owner and owner[0] == self.token:
+                cache.set(worker_key(self.slot), value, ttl)
+            else:
+                # слот истёк и, возможно, занят другим процессом:
+                # берём первый свободный
+                self.slot = 1
+                while not cache.add(worker_key(self.slot), value, ttl):
+                    self.slot += 1
+            if (cache.get(SLOTS_KEY) or 0) < self.slot:
+                cache.set(SLOTS_KEY, self.slot, None)
+
+
+_registry = Registry()
+
+
+def registry():
+    """Реестр текущего процесса: после fork у потомка он свой."""
+    global _registry
+    if _registry.pid != os.getpid():
+        _registry = Registry()
+    return _registry
+
+
+def collect():
+    """Сумма снимков процессов, писавших в общий кэш не раньше
+    METRICS_SLOT_TTL секунд назад."""
+    registry().flush(force=True)
+    slots = cache.get(SLOTS_KEY) or 0
+    snapshots = cache.get_many(
+        [worker_key(slot) for slot in range(1, slots + 1)]
+    )
+    total = {}
+    for _, snapshot in snapshots.values():
+        for key, value in snapshot.items():
+            if isinstance(value, list):
+                row = total.setdefault(key, [0] * len(value))
+                for i, part in enumerate(value):
+                    row[i] += part
+            else:
+                total[key] = total.get(key, 0) + value
+    return total
+
+
+def label(view):
+    return view.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def exposition(values):
+    """Текстовый формат экспозиции Prometheus."""
+    lines = []
+    for metric, (kind, buckets, description) in METRICS.items():
+        name = PREFIX + metric
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for (key, view), value in sorted(values.items()):
+            if key != metric:
+                continue
+            view = label(view)
+            if kind == 'counter':
+                lines.append(f'{name}{{view="{view}"}} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), value):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{{view="{view}",le="{bound}"}} '
+                    f'{cumulative}'
+                )
+            lines.append(f'{name}_sum{{view="{view}"}} {value[-2]:.6f}')
+            lines.append(f'{name}_count{{view="{view}"}} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def timed_render(render):
+    @wraps(render)
+    def wrapper(self, context):
+        stats = current_stats()
+        # вложенные include считаются в шаблоне верхнего уровня
+        if stats is None or getattr(_local, 'rendering', False):
+            return render(self, context)
+        _local.rendering = True
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            _local.rendering = False
+            stats.template_time += time.perf_counter() - started
+    return wrapper
+
+
+def counted_get(get):
+    missing = object()
+
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        stats = current_stats()
+        if stats is None or getattr(_local, 'in_cache', False):
+            return get(self, key, default, version)
+        _local.in_cache = True
+        try:
+            value = get(self, key, missing, version)
+        finally:
+            _local.in_cache = False
+        if value is missing:
+            stats.cache_misses += 1
+            return default
+        stats.cache_hits += 1
+        return value
+    return wrapper
+
+
+def counted_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        stats = current_stats()
+        if stats is None or getattr(_local, 'in_cache', False):
+            return get_many(self, keys, version)
+        keys = list(keys)
+        _local.in_cache = True
+        try:
+            found = get_many(self, keys, version)
+        finally:
+            _local.in_cache = False
+        stats.cache_hits += len(found)
+        stats.cache_misses += len(keys) - len(found)
+        return found
+    return wrapper
+
+
+def install_hooks():
+    """Оборачивает отрисовку шаблонов и чтение кэша один раз на процесс."""
+    if getattr(Template.render, 'metrics_hook', False):
+        return
+    Template.render = timed_render(Template.render)
+    Template.render.metrics_hook = True
+    backend = type(caches['default'])
+    backend.get = counted_get(backend.get)
+    backend.get_many = counted_get_many(backend.get_many)
+
+
+class MetricsMiddleware:
+    """Замеряет каждый запрос по имени view: время, SQL-запросы,
+    отрисовку шаблонов и обращения к кэшу.
+
+    METRICS_ENABLED = False отключает middleware.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        install_hooks()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = _local.stats = RequestStats()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _local.stats = None
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else UNRESOLVED
+        metrics = registry()
+        metrics.record(view, duration, stats)
+        metrics.flush()
+        metrics.start_heartbeat()
+        return response
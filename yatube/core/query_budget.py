@@ -0,0 +1,71 @@
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(limit):
+    """Декоратор для view-функций: допустимое число SQL-запросов."""
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+def get_query_budget(view_func):
+    """Бюджет запросов view: атрибут query_budget у класса или функции.
+
+    Бюджет задаётся на весь запрос авторизованного пользователя,
+    включая загрузку сессии и пользователя.
+    """
+    view_class = getattr(view_func, 'view_class', None)
+    return getattr(view_class or view_func, 'query_budget', None)
+
+
+class QueryCounter:
+    """Обёртка execute_wrapper, считающая выполненные запросы."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMiddleware:
+    """Сверяет число запросов с бюджетом view.
+
+    QUERY_BUDGET_MODE = 'log' пишет предупреждение в лог,
+    'raise' выбрасывает QueryBudgetExceeded; без настройки
+    middleware отключается.
+    """
+
+    def __init__(self, get_response):
+        self.mode = getattr(settings, 'QUERY_BUDGET_MODE', None)
+        if self.mode not in ('log', 'raise'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        match = request.resolver_match
+        budget = match and get_query_budget(match.func)
+        if budget is not None and counter.count > budget:
+            message = (
+                f'{match.view_name}: {counter.count} SQL-запросов '
+                f'при бюджете {budget}'
+            )
+            if self.mode == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
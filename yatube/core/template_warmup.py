@@ -0,0 +1,40 @@
+import logging
+import os
+
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+
+logger = logging.getLogger(__name__)
+
+
+def template_names(loader):
+    """Имена шаблонов во всех каталогах загрузчика."""
+    loaders = getattr(loader, 'loaders', [loader])
+    for source in loaders:
+        for directory in source.get_dirs():
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    if name.endswith(('.html', '.txt')):
+                        path = os.path.join(root, name)
+                        yield os.path.relpath(path, directory).replace(
+                            os.sep, '/'
+                        )
+
+
+def warm_up_templates():
+    """Компилирует шаблоны, чтобы их закэшировал cached.Loader
+    до первого запроса; возвращает число шаблонов."""
+    compiled = 0
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        if engine is None:
+            continue
+        for loader in engine.template_loaders:
+            for name in set(template_names(loader)):
+                try:
+                    engine.get_template(name)
+                except (TemplateDoesNotExist, TemplateSyntaxError,
+                        UnicodeDecodeError) as e:
+                    logger.debug('Шаблон %s не скомпилирован: %s', name, e)
+                else:
+                    compiled += 1
+    return compiled
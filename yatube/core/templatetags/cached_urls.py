@@ -0,0 +1,25 @@
+from functools import lru_cache
+
+from django import template
+from django.urls import get_script_prefix, get_urlconf, reverse
+
+register = template.Library()
+
+
+@lru_cache(maxsize=20000)
+def _reverse(urlconf, prefix, viewname, args):
+    return reverse(viewname, urlconf, args)
+
+
+def reverse_url(viewname, *args):
+    """reverse() с запоминанием: ссылки карточек повторяются
+    от страницы к странице."""
+    return _reverse(
+        get_urlconf(), get_script_prefix(), viewname,
+        tuple(str(arg) for arg in args),
+    )
+
+
+@register.simple_tag
+def cached_url(viewname, *args):
+    return reverse_url(viewname, *args)
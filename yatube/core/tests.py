@@ -0,0 +1,296 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.signals import request_finished, request_started
+from django.db import connection, connections
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.template import engines
+from django.urls import reverse
+
+from core import after_response, db_router, metrics
+from core.cache import SQLiteCache
+from core.template_warmup import warm_up_templates
+from core.templatetags.cached_urls import _reverse, reverse_url
+from posts.models import Group, Post, User, UserStats
+
+
+def increment(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.location = os.path.join(self.dir.name, 'cache.sqlite3')
+        self.cache = SQLiteCache(
+            self.location, {'OPTIONS': {'MAX_SIZE': 10 * 1024}}
+        )
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_basic_operations(self):
+        self.cache.set('text', 'значение')
+        self.cache.set_many({'list': [1, 2], 'number': 5})
+        self.assertEqual(self.cache.get('text'), 'значение')
+        self.assertEqual(
+            self.cache.get_many(['list', 'number', 'missing']),
+            {'list': [1, 2], 'number': 5},
+        )
+        self.assertFalse(self.cache.add('text', 'другое'))
+        self.assertTrue(self.cache.add('new', 'другое'))
+        self.assertEqual(self.cache.incr('number', 10), 15)
+        self.assertEqual(self.cache.decr('number'), 14)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.delete_many(['text', 'list'])
+        self.assertFalse(self.cache.has_key('text'))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('new'))
+
+    def test_expired_entries_are_invisible(self):
+        self.cache.set('key', 'value', timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'value'))
+
+    def test_is_shared_between_processes(self):
+        """incr атомарен и виден всем процессам, открывшим файл."""
+        self.cache.set('counter', 0)
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            list(executor.map(
+                increment, [self.location] * 4, [50] * 4
+            ))
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_tests_do_not_share_server_cache(self):
+        location = settings.CACHES['default']['LOCATION']
+        self.assertNotEqual(
+            location, os.path.join(settings.BASE_DIR, 'cache.sqlite3')
+        )
+        self.assertTrue(location.startswith(tempfile.gettempdir()))
+
+    def test_least_recently_read_entries_are_evicted(self):
+        self.cache.ACCESS_RESOLUTION = 0
+        self.cache.set('kept', 'x' * 1024)
+        for i in range(20):
+            self.cache.get('kept')
+            self.cache.set(f'filler_{i}', 'x' * 1024)
+        self.assertEqual(self.cache.get('kept'), 'x' * 1024)
+        self.assertIsNone(self.cache.get('filler_0'))
+        total = self.cache._total_size(self.cache._db)
+        self.assertLessEqual(total, 10 * 1024)
+
+
+class SQLitePragmaTests(TestCase):
+    def test_new_connections_are_tuned(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(
+                cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout']
+            )
+            cursor.execute('PRAGMA synchronous')
+            # 1 — NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(TestCase):
+    """Основная база и реплика в двух файлах SQLite; реплика отстаёт
+    от основной базы, пока в неё не скопированы строки."""
+
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.TemporaryDirectory()
+        settings.DATABASES['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.dir.name, 'replica.sqlite3'),
+        }
+        with override_settings(DATABASE_REPLICAS=['replica']):
+            call_command('migrate', database='replica', verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del settings.DATABASES['replica']
+        cls.dir.cleanup()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='author')
+        self.replicate(User, UserStats, Group, Post)
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def replicate(self, *models):
+        for model in models:
+            model.objects.using('replica').bulk_create(
+                model.objects.using('default').all(), ignore_conflicts=True
+            )
+
+    def test_reads_go_to_replica(self):
+        Group.objects.using('replica').create(
+            title='Только на реплике', description='', slug='replica-only'
+        )
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': 'replica-only'})
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Group.objects.using('default').exists())
+
+    def test_write_pins_reads_to_primary(self):
+        router = db_router.ReplicaRouter()
+        db_router.reset_pin()
+        self.assertEqual(router.db_for_read(Post), 'replica')
+        self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertEqual(router.db_for_read(Post), 'default')
+        db_router.reset_pin()
+        self.assertEqual(router.db_for_read(Post), 'replica')
+
+    def test_client_reads_own_writes_after_redirect(self):
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Свежий пост'}
+        )
+        self.assertIn(db_router.PIN_COOKIE, response.cookies)
+        profile = reverse('posts:profile', kwargs={'username': 'author'})
+        self.assertContains(self.client.get(profile), 'Свежий пост')
+        cache.clear()
+        other = Client()
+        other.force_login(self.user)
+        self.assertNotContains(other.get(profile), 'Свежий пост')
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics._registry = metrics.Registry()
+
+    def test_requests_are_measured_per_view(self):
+        for _ in range(3):
+            self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 3', text
+        )
+        self.assertIn(
+            'yatube_sql_queries_count{view="posts:index"} 3', text
+        )
+        self.assertIn('yatube_template_render_seconds_sum', text)
+        self.assertIn('yatube_cache_hits_total{view="posts:index"}', text)
+        self.assertIn('yatube_cache_misses_total{view="posts:index"}', text)
+
+    def test_workers_are_aggregated(self):
+        """Каждый процесс пишет свой снимок, /metrics/ их складывает."""
+        stats = metrics.RequestStats()
+        stats.queries = 4
+        for _ in range(2):
+            worker = metrics.Registry()
+            worker.record('posts:index', 0.02, stats)
+            worker.flush(force=True)
+        values = metrics.collect()
+        self.assertEqual(
+            values[('request_duration_seconds', 'posts:index')][-1], 2
+        )
+        self.assertEqual(values[('sql_queries', 'posts:index')][-2], 8)
+
+    def test_endpoint_is_local_only(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.1.2.3')
+        self.assertEqual(response.status_code, 403)
+
+    def test_expired_slots_are_reused(self):
+        """Снимок процесса, переставшего писать, выпадает из суммы,
+        а его слот достаётся новому процессу."""
+        stats = metrics.RequestStats()
+        first, second = metrics.Registry(), metrics.Registry()
+        first.record('posts:index', 0.02, stats)
+        first.flush(force=True)
+        cache.delete(metrics.worker_key(first.slot))
+        second.record('posts:index', 0.02, stats)
+        second.flush(force=True)
+        self.assertEqual(second.slot, 1)
+        # первый процесс не перезаписывает чужой слот, а занимает новый
+        first.flush(force=True)
+        self.assertEqual(first.slot, 2)
+        self.assertEqual(
+            metrics.collect()[('request_duration_seconds', 'posts:index')][-1],
+            2,
+        )
+        cache.delete(metrics.worker_key(first.slot))
+        cache.delete(metrics.worker_key(second.slot))
+        metrics._registry = metrics.Registry()
+        self.assertNotIn(
+            ('request_duration_seconds', 'posts:index'), metrics.collect()
+        )
+
+    @override_settings(METRICS_FLUSH_INTERVAL=0.05, METRICS_SLOT_TTL=0.3)
+    def test_idle_worker_keeps_its_slot(self):
+        """Процесс без запросов не теряет слот, пока жив."""
+        worker = metrics._registry
+        worker.record('posts:index', 0.02, metrics.RequestStats())
+        worker.flush(force=True)
+        worker.start_heartbeat()
+        time.sleep(0.6)
+        self.assertEqual(
+            cache.get(metrics.worker_key(worker.slot))[0], worker.token
+        )
+        # замена реестра останавливает поток
+        metrics._registry = metrics.Registry()
+        worker.heartbeat.join(1)
+        self.assertFalse(worker.heartbeat.is_alive())
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_replaces_address_check(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        response = self.client.get(
+            url, REMOTE_ADDR='10.1.2.3', HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class TemplatePipelineTests(SimpleTestCase):
+    def test_url_reversals_are_memoized(self):
+        _reverse.cache_clear()
+        for _ in range(3):
+            self.assertEqual(
+                reverse_url('posts:post_detail', 7),
+                reverse('posts:post_detail', args=[7]),
+            )
+        self.assertEqual(_reverse.cache_info().hits, 2)
+
+    def test_warm_up_fills_cached_loader(self):
+        loader = engines['django'].engine.template_loaders[0]
+        loader.reset()
+        self.assertGreater(warm_up_templates(), 0)
+        self.assertIn(
+            'posts/includes/post_card.html', loader.get_template_cache
+        )
+
+
+class AfterResponseTests(SimpleTestCase):
+    def test_calls_run_after_request_finishes(self):
+        calls = []
+        after_response.defer(calls.append, 'сразу')
+        self.assertEqual(calls, ['сразу'])
+        request_started.send(sender=self.__class__)
+        after_response.defer(calls.append, 'после ответа')
+        after_response.defer(int, 'не число')
+        after_response.defer(calls.append, 'и это')
+        self.assertEqual(calls, ['сразу'])
+        with self.assertLogs('core.after_response', 'ERROR'):
+            request_finished.send(sender=self.__class__)
+        self.assertEqual(calls, ['сразу', 'после ответа', 'и это'])
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
+from .search import match_expression, matching_ids, uses_fts
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -11,6 +12,18 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # поиск по тексту идёт через полнотекстовый индекс, а не LIKE
+        if not search_term or not uses_fts():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        # в запросе из одних знаков препинания нет слов: пустой MATCH
+        # в FTS5 — синтаксическая ошибка
+        if not match_expression(search_term):
+            return queryset.none(), False
+        return queryset.filter(id__in=matching_ids(search_term)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'description')
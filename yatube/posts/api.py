@@ -0,0 +1,267 @@
+import json
+
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse
+from django.views import View
+
+from yatube.settings import COMMENTS_ON_PAGE, FOLLOW_BULK_LIMIT, POSTS_ON_PAGE
+
+from .follow_graph import following_among, is_following
+from .follows import follow, timeline_of, unfollow
+from .models import Comment, Group, Post, User, UserStats
+from .paginators import CursorPaginator, InvalidCursor
+
+# имя поля в ответе -> путь для values(); связанные таблицы
+# присоединяются к запросу, только если их поле запрошено
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+    'post': 'post_id',
+}
+
+
+class InvalidFields(Exception):
+    pass
+
+
+def json_error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def image_url(name):
+    return default_storage.url(name) if name else None
+
+
+class ApiView(View):
+    """Read-only JSON-представление с выбором полей.
+
+    ?fields=id,text,author ограничивает ответ и сам запрос: строки
+    выбираются через values() только с нужными столбцами, без создания
+    моделей.
+    """
+    fields = POST_FIELDS
+    # столбцы, которые нужны представлению независимо от ?fields=
+    required_fields = ('id',)
+    login_required = False
+
+    def selected_fields(self):
+        requested = self.request.GET.get('fields')
+        if not requested:
+            return list(self.fields)
+        names = [name.strip() for name in requested.split(',')]
+        unknown = sorted(set(names) - set(self.fields))
+        if unknown:
+            raise InvalidFields(f'Неизвестные поля: {", ".join(unknown)}')
+        return list(dict.fromkeys(names))
+
+    def values(self, queryset, names, *extra):
+        paths = [self.fields[name] for name in names]
+        paths += [self.fields[name] for name in self.required_fields]
+        return queryset.values(*dict.fromkeys(paths + list(extra)))
+
+    def serialize(self, row, names):
+        item = {name: row[self.fields[name]] for name in names}
+        if 'image' in item:
+            item['image'] = image_url(item['image'])
+        return item
+
+    def get(self, request, *args, **kwargs):
+        if self.login_required and not request.user.is_authenticated:
+            return json_error('Требуется авторизация', status=401)
+        try:
+            return JsonResponse(self.get_data(self.selected_fields()))
+        except (InvalidFields, InvalidCursor) as e:
+            return json_error(str(e), status=400)
+        except Http404 as e:
+            return json_error(str(e) or 'Не найдено', status=404)
+
+    def get_data(self, names):
+        raise NotImplementedError
+
+
+class ApiListView(ApiView):
+    """Лента в JSON с курсорной пагинацией ?after=/?before=."""
+    paginate_by = POSTS_ON_PAGE
+    cursor_field = 'pub_date'
+    cursor_tiebreak = 'id'
+    required_fields = ('id', 'pub_date')
+
+    def get_queryset(self):
+        return Post.objects.all()
+
+    def get_data(self, names):
+        paginator = CursorPaginator(
+            self.values(
+                self.get_queryset(), names,
+                self.cursor_field, self.cursor_tiebreak,
+            ),
+            self.paginate_by,
+            field=self.cursor_field,
+            tiebreak=self.cursor_tiebreak,
+        )
+        page = paginator.cursor_page(
+            after=self.request.GET.get('after') or None,
+            before=self.request.GET.get('before') or None,
+        )
+        return {
+            'results': [self.serialize(row, names) for row in page],
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+        }
+
+
+def get_id_or_404(queryset):
+    """id записи отдельным запросом, чтобы лента не join-ила её таблицу."""
+    pk = queryset.values_list('id', flat=True).first()
+    if pk is None:
+        raise Http404
+    return pk
+
+
+class ApiIndexView(ApiListView):
+    query_budget = 3
+
+
+class ApiGroupView(ApiListView):
+    query_budget = 4
+
+    def get_queryset(self):
+        group_id = get_id_or_404(
+            Group.objects.filter(slug=self.kwargs['slug'])
+        )
+        return super().get_queryset().filter(group_id=group_id)
+
+
+class ApiProfileView(ApiListView):
+    query_budget = 4
+
+    def get_queryset(self):
+        author_id = get_id_or_404(
+            User.objects.filter(username=self.kwargs['username'])
+        )
+        return super().get_queryset().filter(author_id=author_id)
+
+
+class ApiFollowView(ApiListView):
+    query_budget = 3
+    login_required = True
+    cursor_field = 'feed_date'
+    cursor_tiebreak = 'feed_post'
+
+    def get_queryset(self):
+        return timeline_of(super().get_queryset(), self.request.user)
+
+
+class ApiPostDetailView(ApiView):
+    query_budget = 3
+
+    def get_data(self, names):
+        row = self.values(
+            Post.objects.filter(pk=self.kwargs['pk']), names
+        ).first()
+        if row is None:
+            raise Http404
+        return self.serialize(row, names)
+
+
+class ApiCommentsView(ApiListView):
+    fields = COMMENT_FIELDS
+    paginate_by = COMMENTS_ON_PAGE
+    cursor_field = 'created'
+    required_fields = ('id', 'created')
+    query_budget = 4
+
+    def get_queryset(self):
+        post_id = get_id_or_404(Post.objects.filter(pk=self.kwargs['pk']))
+        return Comment.objects.filter(post_id=post_id)
+
+
+class ApiActionView(View):
+    """Изменяющее JSON-представление для авторизованных пользователей."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return json_error('Требуется авторизация', status=401)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except Http404 as e:
+            return json_error(str(e) or 'Не найдено', status=404)
+
+
+class ApiFollowAuthorView(ApiActionView):
+    """POST подписывает на автора, DELETE отписывает от него.
+
+    Ответ — новое состояние кнопки подписки, чтобы не перерисовывать
+    профиль. Повтор запроса не ошибка: changed показывает, изменил ли
+    он что-нибудь.
+    """
+
+    def post(self, request, username):
+        return self.respond(username, follow)
+
+    def delete(self, request, username):
+        return self.respond(username, unfollow)
+
+    def respond(self, username, action):
+        author_id = get_id_or_404(User.objects.filter(username=username))
+        user_id = self.request.user.id
+        changed = action(user_id, [author_id])
+        followers_count = UserStats.objects.filter(
+            user_id=author_id
+        ).values_list('followers_count', flat=True).first()
+        return JsonResponse({
+            'author': username,
+            'following': is_following(user_id, author_id),
+            'changed': bool(changed),
+            'followers_count': followers_count or 0,
+        })
+
+
+class ApiFollowBulkView(ApiActionView):
+    """Подписка на несколько авторов сразу: JSON {"authors": [имена]}
+    или поля формы authors.
+
+    Отвечает, на кого подписка создана сейчас, на кого из списка
+    пользователь подписан теперь и каких имён нет.
+    """
+
+    def post(self, request):
+        if request.content_type != 'application/json':
+            names = request.POST.getlist('authors')
+        else:
+            try:
+                names = json.loads(request.body)['authors']
+            except (ValueError, KeyError, TypeError):
+                return json_error('Ожидается {"authors": [...]}', status=400)
+        if not isinstance(names, list) or not all(
+            isinstance(name, str) for name in names
+        ):
+            return json_error('authors должен быть списком имён', status=400)
+        if len(names) > FOLLOW_BULK_LIMIT:
+            return json_error(
+                f'Не больше {FOLLOW_BULK_LIMIT} авторов за раз', status=400
+            )
+        authors = dict(
+            User.objects.filter(username__in=names).values_list(
+                'id', 'username'
+            )
+        )
+        user_id = request.user.id
+        created = follow(user_id, authors)
+        following = following_among(user_id, authors)
+        return JsonResponse({
+            'followed': sorted(authors[pk] for pk in created),
+            'following': sorted(authors[pk] for pk in following),
+            'missing': sorted(set(names) - set(authors.values())),
+        })
@@ -0,0 +1,52 @@
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from yatube.settings import POST_CARD_TIMEOUT
+
+from .thumbnails import resolve_thumbnails
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+# варианты карточки: с автором (лента, группа, подписки) и без (профиль)
+CARD_VARIANTS = ('author', 'plain')
+
+
+def card_key(post_id, variant):
+    return f'post_card:{variant}:{post_id}'
+
+
+def render_cards(posts, show_author=True):
+    """HTML-карточки постов страницы.
+
+    Готовые карточки достаются из кэша одним get_many,
+    отрисовываются и сохраняются только отсутствующие.
+    """
+    variant = CARD_VARIANTS[0] if show_author else CARD_VARIANTS[1]
+    keys = [card_key(post.id, variant) for post in posts]
+    cached = cache.get_many(keys)
+    # миниатюры нужны только карточкам, которых нет в кэше
+    resolve_thumbnails([
+        post for key, post in zip(keys, posts) if key not in cached
+    ])
+    missing = {}
+    cards = []
+    for key, post in zip(keys, posts):
+        card = cached.get(key)
+        if card is None:
+            card = render_to_string(
+                CARD_TEMPLATE, {'post': post, 'show_author': show_author}
+            )
+            missing[key] = card
+        cards.append(mark_safe(card))
+    if missing:
+        cache.set_many(missing, POST_CARD_TIMEOUT)
+    return cards
+
+
+def invalidate_cards(post_ids):
+    """Сбрасывает карточки постов во всех вариантах."""
+    cache.delete_many([
+        card_key(post_id, variant)
+        for post_id in post_ids
+        for variant in CARD_VARIANTS
+    ])
@@ -0,0 +1,60 @@
+import hashlib
+from calendar import timegm
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .generations import EPOCH, get_generations
+
+
+def feed_state(scope):
+    """Версия ленты — поколения EPOCH и области одним get_many.
+
+    Поколение области меняют новые и удалённые посты, EPOCH — правки
+    постов, групп и авторов, поэтому саму ленту читать не нужно.
+    """
+    return tuple(get_generations([EPOCH, scope]))
+
+
+def make_etag(request, *parts):
+    """ETag страницы: состояние данных, зритель и адрес с параметрами.
+
+    В страницы встроен CSRF-токен (формы, кнопка подписки), а вход
+    на сайт меняет его секрет: после повторного входа страница из
+    кэша браузера не должна отправлять устаревший токен.
+    """
+    user_id = request.user.id if request.user.is_authenticated else None
+    csrf_secret = request.META.get('CSRF_COOKIE')
+    raw = repr(
+        (request.get_full_path(), user_id, csrf_secret) + parts
+    ).encode()
+    return quote_etag(hashlib.md5(raw).hexdigest())
+
+
+class ConditionalMixin:
+    """Условный GET: 304 Not Modified до выборки данных и рендеринга.
+
+    Представление определяет get_validators(), возвращающий
+    состояние данных страницы и дату её последнего изменения
+    (или None); None вместо пары отключает условный GET.
+    """
+
+    def get_validators(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+        state, modified = validators
+        etag = make_etag(request, state)
+        last_modified = modified and timegm(modified.utctimetuple())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
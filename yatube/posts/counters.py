@@ -0,0 +1,70 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, UserStats
+
+
+def count_of(model, field):
+    """Подзапрос с числом строк model, ссылающихся на внешнюю запись."""
+    rows = model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(total=Count('*')).values('total')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def recount_users(user_ids):
+    """Пересчитывает счётчики пользователей по фактическим данным."""
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+    UserStats.objects.filter(user_id__in=user_ids).update(
+        posts_count=count_of(Post, 'author'),
+        followers_count=count_of(Follow, 'author'),
+        following_count=count_of(Follow, 'user'),
+    )
+
+
+def recount_posts(post_ids):
+    Post.objects.filter(id__in=post_ids).update(
+        comments_count=count_of(Comment, 'post'),
+    )
+
+
+def shifted(field, delta):
+    """F(field) + delta, не ниже нуля: счётчики положительные, а записи
+    в обход сигналов (bulk_create) могли их не увеличить."""
+    if delta < 0:
+        return Greatest(F(field) + delta, 0)
+    return F(field) + delta
+
+
+def bump_user(user_id, **deltas):
+    bump_users([user_id], **deltas)
+
+
+def bump_users(user_ids, **deltas):
+    """Атомарно меняет счётчики пользователей одним UPDATE с F().
+
+    Если у кого-то строки счётчиков ещё нет, счётчики пересчитываются,
+    а не увеличиваются, чтобы не потерять уже существующие записи.
+    """
+    changes = {field: shifted(field, delta) for field, delta in deltas.items()}
+    updated = UserStats.objects.filter(user_id__in=user_ids).update(**changes)
+    if updated == len(user_ids):
+        return
+    if min(deltas.values()) < 0:
+        # при удалении пользователя его счётчики уже удалены каскадом
+        return
+    try:
+        with transaction.atomic():
+            recount_users(user_ids)
+    except IntegrityError:
+        pass
+
+
+def bump_post(post_id, delta):
+    Post.objects.filter(id=post_id).update(
+        comments_count=shifted('comments_count', delta)
+    )
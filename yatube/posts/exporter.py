@@ -0,0 +1,94 @@
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Post
+
+# тип записи -> (модель, поле водяного знака, {поле записи: путь values()});
+# записи совместимы с import_content
+EXPORTS = {
+    'post': (Post, 'pub_date', {
+        'id': 'id',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'image': 'image',
+        'comments_count': 'comments_count',
+    }),
+    'comment': (Comment, 'created', {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }),
+    # у подписок нет даты, они выгружаются целиком
+    'follow': (Follow, None, {
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+EXPORT_TYPES = tuple(EXPORTS)
+
+
+class InvalidWatermark(Exception):
+    pass
+
+
+def parse_watermark(value):
+    if not value:
+        return None
+    try:
+        moment = parse_datetime(value)
+    except ValueError:
+        # формат верный, но такой даты нет: 2020-02-30
+        moment = None
+    if moment is None:
+        raise InvalidWatermark(f'Некорректная дата: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_rows(kind, since=None, chunk_size=2000):
+    """Записи одного типа через values_list() и iterator(chunk_size).
+
+    Записи идут по возрастанию водяного знака, поэтому дата последней
+    строки годится как since для следующей выгрузки.
+    """
+    model, watermark, fields = EXPORTS[kind]
+    rows = model.objects.all()
+    if watermark:
+        if since is not None:
+            rows = rows.filter(**{f'{watermark}__gt': since})
+        rows = rows.order_by(watermark, 'id')
+    else:
+        rows = rows.order_by('id')
+    rows = rows.values_list(*fields.values())
+    for values in rows.iterator(chunk_size=chunk_size):
+        row = {'type': kind}
+        row.update(zip(fields, values))
+        yield row
+
+
+def export_lines(kinds=EXPORT_TYPES, since=None, chunk_size=2000):
+    """Записи NDJSON, по строке на запись."""
+    for kind in kinds:
+        for row in export_rows(kind, since, chunk_size):
+            yield json.dumps(
+                row, cls=DjangoJSONEncoder, ensure_ascii=False
+            ) + '\n'
+
+
+def gzip_stream(lines, level=6):
+    """Сжимает поток строк в gzip по мере чтения."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for line in lines:
+        chunk = compressor.compress(line.encode())
+        if chunk:
+            yield chunk
+    yield compressor.flush()
@@ -0,0 +1,49 @@
+from django.core.cache import cache
+
+from yatube.settings import FEED_COUNT_LIMIT, FEED_COUNT_TIMEOUT
+
+from .generations import EPOCH, generation_key, get_generations
+
+
+def count_key(scope):
+    return f'feed_count:{scope}'
+
+
+def bounded_count(posts, limit=FEED_COUNT_LIMIT):
+    """COUNT(*) не дальше limit записей: LIMIT во вложенном запросе.
+
+    limit=None — точный подсчёт.
+    """
+    posts = posts.select_related(None).order_by()
+    if limit is None:
+        return posts.count()
+    return posts.values('id')[:limit].count()
+
+
+def scope_count(scope, posts, limit=FEED_COUNT_LIMIT):
+    """Число постов области ленты и признак его точности.
+
+    Число хранится в кэше вместе с поколениями EPOCH и области: новый
+    или удалённый пост меняет поколение области, правка (в том числе
+    смена группы) — EPOCH, и число пересчитывается. Для ленты больше
+    limit постов точного числа нет, только оценка снизу;
+    limit=None считает точно и заменяет оценку в кэше.
+    """
+    if scope is None:
+        count = bounded_count(posts, limit)
+        return count, limit is None or count < limit
+    keys = [generation_key(EPOCH), generation_key(scope), count_key(scope)]
+    found = cache.get_many(keys)
+    generations = (found.get(keys[0]), found.get(keys[1]))
+    cached = found.get(keys[2])
+    if (
+        None not in generations and cached and cached[0] == generations
+        and (cached[2] or limit is not None)
+    ):
+        return cached[1], cached[2]
+    if None in generations:
+        generations = tuple(get_generations([EPOCH, scope]))
+    count = bounded_count(posts, limit)
+    exact = limit is None or count < limit
+    cache.set(keys[2], (generations, count, exact), FEED_COUNT_TIMEOUT)
+    return count, exact
@@ -0,0 +1,99 @@
+from array import array
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db import transaction
+
+from yatube.settings import FOLLOW_GRAPH_TIMEOUT
+
+from .generations import new_generation
+from .models import Follow
+
+# 4 байта на автора: id пользователей помещаются в беззнаковый int
+TYPECODE = 'I'
+
+
+def followees_key(user_id):
+    return f'followees:{user_id}'
+
+
+def version_key(user_id):
+    return f'followees_gen:{user_id}'
+
+
+def pack(author_ids):
+    return array(TYPECODE, sorted(author_ids)).tobytes()
+
+
+def unpack(raw):
+    followees = array(TYPECODE)
+    followees.frombytes(raw)
+    return followees
+
+
+def contains(followees, author_id):
+    i = bisect_left(followees, author_id)
+    return i < len(followees) and followees[i] == author_id
+
+
+def get_followees(user_id):
+    """Отсортированный массив id авторов, на которых подписан user_id.
+
+    Массив хранится в общем кэше упакованным в байты вместе
+    с поколением, при котором он построен. Если поколение сменилось
+    или массива нет, он строится заново одним запросом по индексу
+    unique_follow; поколение читается до запроса, поэтому массив,
+    построенный до подписки, следующее чтение не примет.
+    """
+    key = followees_key(user_id)
+    found = cache.get_many([version_key(user_id), key])
+    version = found.get(version_key(user_id))
+    if version is not None and key in found:
+        cached_version, raw = found[key]
+        if cached_version == version:
+            return unpack(raw)
+    if version is None:
+        version = new_generation()
+        if not cache.add(version_key(user_id), version, None):
+            version = cache.get(version_key(user_id))
+    author_ids = Follow.objects.filter(user_id=user_id).values_list(
+        'author_id', flat=True
+    )
+    raw = pack(author_ids)
+    cache.set(key, (version, raw), FOLLOW_GRAPH_TIMEOUT)
+    return unpack(raw)
+
+
+def is_following(user_id, author_id):
+    return contains(get_followees(user_id), author_id)
+
+
+def following_among(user_id, author_ids):
+    """Авторы из author_ids, на которых подписан user_id:
+    проверка для всей страницы одним обращением к кэшу."""
+    followees = get_followees(user_id)
+    return {
+        author_id for author_id in author_ids
+        if contains(followees, author_id)
+    }
+
+
+def forget_followees(user_ids):
+    """Делает устаревшими массивы подписок пользователей.
+
+    Поколение меняется сразу, чтобы изменения были видны внутри
+    текущей транзакции, и ещё раз после её фиксации: массив, который
+    другой процесс успел построить по данным до фиксации, тоже
+    перестаёт совпадать с поколением.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+
+    def bump():
+        cache.set_many({
+            version_key(user_id): new_generation() for user_id in user_ids
+        }, None)
+
+    bump()
+    transaction.on_commit(bump)
@@ -0,0 +1,90 @@
+from django.db import connections, router
+from django.db.models import F
+
+from .models import Follow, User
+from .signals import followed, unfollowed
+
+
+def _execute(sql, params):
+    using = router.db_for_write(Follow)
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _names():
+    ops = connections[router.db_for_write(Follow)].ops
+    return (
+        ops,
+        ops.quote_name(Follow._meta.db_table),
+        ops.quote_name(Follow._meta.get_field('user').column),
+        ops.quote_name(Follow._meta.get_field('author').column),
+    )
+
+
+def follow(user_id, author_ids):
+    """Подписывает user_id на авторов одним INSERT ... RETURNING.
+
+    Уже существующие подписки пропускаются ограничением unique_follow,
+    несуществующие пользователи и сам user_id — условием SELECT, поэтому
+    повторный вызов ничего не меняет. Возвращает id авторов, подписка
+    на которых создана этим вызовом.
+
+    Сигналы post_save не отправляются: счётчики, граф подписок и лента
+    обновляются сразу для всех новых подписок. RETURNING требует
+    SQLite 3.35 или PostgreSQL.
+    """
+    author_ids = list(dict.fromkeys(author_ids))
+    if not author_ids:
+        return []
+    ops, table, user_column, author_column = _names()
+    users = ops.quote_name(User._meta.db_table)
+    pk = ops.quote_name(User._meta.pk.column)
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    created = _execute(
+        f'{ops.insert_statement(ignore_conflicts=True)} {table} '
+        f'({user_column}, {author_column}) '
+        f'SELECT %s, {pk} FROM {users} '
+        f'WHERE {pk} IN ({placeholders}) AND {pk} <> %s '
+        f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)} '
+        f'RETURNING {author_column}',
+        [user_id, *author_ids, user_id],
+    )
+    if created:
+        followed(user_id, created)
+    return created
+
+
+def unfollow(user_id, author_ids):
+    """Отписывает user_id от авторов одним DELETE ... RETURNING.
+
+    Отсутствующие подписки не считаются ошибкой. Возвращает id авторов,
+    подписка на которых удалена этим вызовом.
+    """
+    author_ids = list(dict.fromkeys(author_ids))
+    if not author_ids:
+        return []
+    _, table, user_column, author_column = _names()
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    deleted = _execute(
+        f'DELETE FROM {table} '
+        f'WHERE {user_column} = %s AND {author_column} IN ({placeholders}) '
+        f'RETURNING {author_column}',
+        [user_id, *author_ids],
+    )
+    if deleted:
+        unfollowed(user_id, deleted)
+    return deleted
+
+
+def timeline_of(posts, user):
+    """Посты ленты подписок user с ключом строки ленты.
+
+    feed_date и feed_post — столбцы posts_timeline: сортировка и курсор
+    по ним идут по индексу (user, -pub_date, -post) без сортировки
+    всей ленты, тогда как posts_post.pub_date и id ему не принадлежат.
+    """
+    return posts.filter(timeline__user=user).annotate(
+        feed_date=F('timeline__pub_date'),
+        feed_post=F('timeline__post'),
+    )
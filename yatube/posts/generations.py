@@ -0,0 +1,66 @@
+import hashlib
+import uuid
+
+from django.core.cache import cache
+
+# поколение, общее для всех лент: меняется при событиях, затрагивающих
+# карточки в любых лентах (правка поста, группы или автора)
+EPOCH = 'epoch'
+# лента главной страницы
+GLOBAL = 'all'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def follower_scope(user_id):
+    return f'follower:{user_id}'
+
+
+def generation_key(scope):
+    return f'feed_gen:{scope}'
+
+
+def new_generation():
+    # случайное значение, а не счётчик: после вытеснения ключа
+    # поколение не может повториться и воскресить старые страницы
+    return uuid.uuid4().hex[:12]
+
+
+def get_generations(scopes):
+    """Текущие поколения областей лент одним get_many.
+
+    Отсутствующие поколения создаются заново.
+    """
+    keys = [generation_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    missing = {
+        key: new_generation() for key in keys if key not in generations
+    }
+    if missing:
+        cache.set_many(missing, None)
+        generations.update(missing)
+    return [generations[key] for key in keys]
+
+
+def bump_generations(scopes):
+    """Делает устаревшими все закэшированные страницы областей."""
+    cache.set_many(
+        {generation_key(scope): new_generation() for scope in scopes}, None
+    )
+
+
+def feed_cache_key(scope, params):
+    """Ключ страницы ленты: поколения области и параметры запроса.
+
+    Старые страницы не удаляются: после смены поколения их ключи
+    больше не запрашиваются, и они истекают по таймауту.
+    """
+    generations = ':'.join(get_generations([EPOCH, scope]))
+    digest = hashlib.md5(params.encode()).hexdigest()
+    return f'feed:{scope}:{generations}:{digest}'
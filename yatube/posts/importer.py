@@ -0,0 +1,478 @@
+import csv
+import gzip
+import json
+import logging
+import os
+import urllib.request
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .counters import recount_posts, recount_users
+from .follow_graph import forget_followees
+from .generations import (GLOBAL, author_scope, bump_generations,
+                          follower_scope, group_scope)
+from .models import Comment, Follow, Group, Post, Timeline, User
+from .paginators import db_int
+from .signals import batches, iterate_batches
+
+logger = logging.getLogger(__name__)
+
+# порядок, в котором записи должны попадать в базу:
+# строки ссылаются только на типы левее себя
+RECORD_TYPES = ('user', 'group', 'post', 'comment', 'follow')
+DEPENDENCIES = {
+    'user': (),
+    'group': (),
+    'post': ('user', 'group'),
+    'comment': ('user', 'post'),
+    'follow': ('user',),
+}
+# SQLite ограничивает число параметров в одном запросе
+MAX_PARAMS = 900
+
+
+class InvalidRecord(Exception):
+    pass
+
+
+def open_source(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_records(path, record_type=None):
+    """Поштучно читает записи NDJSON или CSV, не загружая файл целиком.
+
+    Тип записи берётся из поля type, а если его нет — из record_type.
+    """
+    name = path[:-3] if path.endswith('.gz') else path
+    with open_source(path) as source:
+        if name.endswith('.csv'):
+            rows = csv.DictReader(source)
+        else:
+            rows = (json.loads(line) for line in source if line.strip())
+        for row in rows:
+            kind = row.pop('type', None) or record_type
+            if kind not in RECORD_TYPES:
+                raise InvalidRecord(f'Неизвестный тип записи: {kind}')
+            yield kind, row
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    moment = parse_datetime(value)
+    if moment is None:
+        raise InvalidRecord(f'Некорректная дата: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+@contextmanager
+def keep_dates(*fields):
+    """Отключает auto_now_add, чтобы сохранить даты из источника."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class LookupMap:
+    """Отображение естественного ключа в id с ограниченным размером.
+
+    Отсутствующие ключи пачки разрешаются одним запросом, давно
+    не использованные вытесняются, поэтому память не растёт
+    с числом пользователей и групп.
+    """
+
+    def __init__(self, queryset, field, size=100000):
+        self.queryset = queryset
+        self.field = field
+        self.size = size
+        self.ids = OrderedDict()
+
+    def resolve(self, keys):
+        keys = set(filter(None, keys))
+        missing = [key for key in keys if key not in self.ids]
+        for start in range(0, len(missing), MAX_PARAMS):
+            self.ids.update(self.queryset.filter(**{
+                f'{self.field}__in': missing[start:start + MAX_PARAMS]
+            }).values_list(self.field, 'id'))
+        found = {}
+        for key in keys:
+            if key in self.ids:
+                self.ids.move_to_end(key)
+                found[key] = self.ids[key]
+        while len(self.ids) > self.size:
+            self.ids.popitem(last=False)
+        return found
+
+
+def existing(queryset, field, values):
+    """Значения field из values, которые уже есть в базе."""
+    values = list(values)
+    found = set()
+    for start in range(0, len(values), MAX_PARAMS):
+        found.update(queryset.filter(**{
+            f'{field}__in': values[start:start + MAX_PARAMS]
+        }).values_list(field, flat=True))
+    return found
+
+
+def fresh(objs, key, found):
+    """Объекты пачки, ключей которых нет среди found, без повторов."""
+    seen = set(found)
+    result = []
+    for obj in objs:
+        if key(obj) not in seen:
+            seen.add(key(obj))
+            result.append(obj)
+    return result
+
+
+def bulk_insert(model, objs, batch_size):
+    """bulk_create по частям: сам bulk_create собирает объекты в список."""
+    for chunk in chunked(objs, batch_size):
+        model.objects.bulk_create(chunk, ignore_conflicts=True)
+
+
+class Importer:
+    """Потоковый импорт пользователей, групп, постов, комментариев
+    и подписок пачками bulk_create.
+
+    Сигналы при bulk_create не срабатывают, поэтому после каждой пачки
+    дополняются ленты подписок, пересчитываются счётчики и меняются
+    поколения лент, которые затронули новые строки; память
+    не растёт с размером файла. Уже существующие строки пропускаются
+    и не попадают ни в ленты, ни в статистику.
+    id постам и комментариям выдаёт база, а id источника хранится
+    в source_id: по нему на посты ссылаются комментарии и по нему
+    повторный импорт узнаёт уже загруженные записи. Пользователи
+    и группы ищутся по username и slug.
+    """
+
+    def __init__(self, batch_size=1000, workers=8, media_dir=None):
+        self.batch_size = batch_size
+        self.media_dir = media_dir
+        self.buffers = {kind: [] for kind in RECORD_TYPES}
+        self.stats = Counter()
+        self.users = LookupMap(User.objects.all(), 'username')
+        self.groups = LookupMap(Group.objects.all(), 'slug')
+        self.posts = LookupMap(Post.objects.all(), 'source_id')
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.touched = self.untouched()
+
+    @staticmethod
+    def untouched():
+        # id и slug, чьи счётчики и ленты изменила текущая пачка
+        return {
+            'users': set(),
+            'posts': set(),
+            'authors': set(),
+            'groups': set(),
+            'followers': set(),
+        }
+
+    def add(self, kind, row):
+        buffer = self.buffers[kind]
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush(kind)
+
+    def flush(self, kind):
+        # строки, на которые ссылается пачка, должны быть уже в базе
+        for dependency in DEPENDENCIES[kind]:
+            self.flush(dependency)
+        rows = self.buffers[kind]
+        if not rows:
+            return
+        self.buffers[kind] = []
+        with transaction.atomic(), keep_dates(
+            Post._meta.get_field('pub_date'),
+            Comment._meta.get_field('created'),
+        ):
+            objs = []
+            for row in getattr(self, f'build_{kind}s')(rows):
+                if row is None:
+                    self.stats[f'{kind}_skipped'] += 1
+                else:
+                    objs.append(row)
+            saved = getattr(self, f'save_{kind}s')(objs)
+            self.recount()
+        self.bump()
+        self.stats[kind] += len(saved)
+        self.stats[f'{kind}_existing'] += len(objs) - len(saved)
+
+    def finish(self):
+        for kind in RECORD_TYPES:
+            self.flush(kind)
+        self.executor.shutdown()
+        return self.stats
+
+    def recount(self):
+        touched = self.touched
+        for user_ids in batches(sorted(touched['users'])):
+            recount_users(user_ids)
+        for post_ids in batches(sorted(touched['posts'])):
+            recount_posts(post_ids)
+
+    def bump(self):
+        """Меняет поколения лент, затронутых пачкой, и забывает её."""
+        touched, self.touched = self.touched, self.untouched()
+        bump_generations(
+            ([GLOBAL] if touched['authors'] else [])
+            + [author_scope(author_id) for author_id in touched['authors']]
+            + [group_scope(slug) for slug in touched['groups']]
+        )
+        for user_ids in batches(sorted(touched['followers'])):
+            bump_generations(follower_scope(user_id) for user_id in user_ids)
+        # новые посты авторов попали в ленты всех их подписчиков
+        for author_ids in batches(sorted(touched['authors'])):
+            followers = Follow.objects.filter(author_id__in=author_ids)
+            for user_ids in iterate_batches(followers, 'user_id'):
+                bump_generations(
+                    follower_scope(user_id) for user_id in user_ids
+                )
+
+    # построение объектов: None означает пропущенную запись
+
+    def build_users(self, rows):
+        for row in rows:
+            if not row.get('username'):
+                yield None
+                continue
+            user = User(
+                username=row['username'],
+                first_name=row.get('first_name') or '',
+                last_name=row.get('last_name') or '',
+                email=row.get('email') or '',
+            )
+            user.set_unusable_password()
+            yield user
+
+    def build_groups(self, rows):
+        for row in rows:
+            if not row.get('slug') or not row.get('title'):
+                yield None
+                continue
+            yield Group(
+                slug=row['slug'],
+                title=row['title'],
+                description=row.get('description') or '',
+            )
+
+    def build_posts(self, rows):
+        authors = self.users.resolve(row.get('author') for row in rows)
+        groups = self.groups.resolve(row.get('group') for row in rows)
+        images = self.executor.map(
+            self.ingest_image, [row.get('image') for row in rows]
+        )
+        for row, image in zip(rows, images):
+            author_id = authors.get(row.get('author'))
+            group = row.get('group')
+            try:
+                if author_id is None or (group and group not in groups):
+                    raise InvalidRecord('Нет автора или группы')
+                yield Post(
+                    source_id=db_int(row['id']),
+                    text=row['text'],
+                    author_id=author_id,
+                    group_id=groups.get(group),
+                    pub_date=parse_date(row.get('pub_date')),
+                    image=image or '',
+                )
+            except (InvalidRecord, KeyError, TypeError, ValueError) as e:
+                logger.debug('Пост пропущен: %s (%s)', row, e)
+                yield None
+
+    def build_comments(self, rows):
+        authors = self.users.resolve(row.get('author') for row in rows)
+        # комментарий ссылается на id поста в источнике
+        posts = self.posts.resolve(to_int(row.get('post')) for row in rows)
+        for row in rows:
+            try:
+                post_id = posts.get(to_int(row.get('post')))
+                author_id = authors.get(row.get('author'))
+                if author_id is None or post_id is None:
+                    raise InvalidRecord('Нет автора или поста')
+                yield Comment(
+                    source_id=db_int(row['id']) if row.get('id') else None,
+                    post_id=post_id,
+                    author_id=author_id,
+                    text=row['text'],
+                    created=parse_date(row.get('created')),
+                )
+            except (InvalidRecord, KeyError, TypeError, ValueError) as e:
+                logger.debug('Комментарий пропущен: %s (%s)', row, e)
+                yield None
+
+    def build_follows(self, rows):
+        users = self.users.resolve(
+            name
+            for row in rows
+            for name in (row.get('user'), row.get('author'))
+        )
+        for row in rows:
+            user_id = users.get(row.get('user'))
+            author_id = users.get(row.get('author'))
+            if None in (user_id, author_id) or user_id == author_id:
+                yield None
+                continue
+            yield Follow(user_id=user_id, author_id=author_id)
+
+    # сохранение пачек: каждый метод возвращает вставленные объекты
+
+    def save_users(self, objs):
+        objs = fresh(objs, lambda user: user.username, existing(
+            User.objects.all(), 'username', {user.username for user in objs}
+        ))
+        User.objects.bulk_create(objs, ignore_conflicts=True)
+        # bulk_create в SQLite не возвращает id, а счётчики новых
+        # пользователей нужно создать
+        self.touched['users'].update(
+            self.users.resolve(user.username for user in objs).values()
+        )
+        return objs
+
+    def save_groups(self, objs):
+        objs = fresh(objs, lambda group: group.slug, existing(
+            Group.objects.all(), 'slug', {group.slug for group in objs}
+        ))
+        Group.objects.bulk_create(objs, ignore_conflicts=True)
+        return objs
+
+    def save_posts(self, objs):
+        objs = fresh(objs, lambda post: post.source_id, existing(
+            Post.objects.all(), 'source_id', {post.source_id for post in objs}
+        ))
+        Post.objects.bulk_create(objs, ignore_conflicts=True)
+        # bulk_create в SQLite не возвращает id: они нужны для лент
+        ids = self.posts.resolve(post.source_id for post in objs)
+        for post in objs:
+            post.id = ids[post.source_id]
+        authors = {post.author_id for post in objs}
+        self.touched['users'].update(authors)
+        self.touched['authors'].update(authors)
+        group_ids = sorted({post.group_id for post in objs} - {None})
+        for ids in batches(group_ids, MAX_PARAMS):
+            self.touched['groups'].update(Group.objects.filter(
+                id__in=ids
+            ).values_list('slug', flat=True))
+        followers = Follow.objects.filter(
+            author_id__in=authors
+        ).values_list('author_id', 'user_id')
+        posts_of = {}
+        for post in objs:
+            posts_of.setdefault(post.author_id, []).append(post)
+        bulk_insert(Timeline, (
+            Timeline(
+                user_id=user_id,
+                post_id=post.id,
+                author_id=author_id,
+                pub_date=post.pub_date,
+            )
+            for author_id, user_id in followers.iterator()
+            for post in posts_of[author_id]
+        ), self.batch_size)
+        return objs
+
+    def save_comments(self, objs):
+        # комментарии без id в источнике всегда новые
+        known = [comment for comment in objs if comment.source_id is not None]
+        objs = [
+            comment for comment in objs if comment.source_id is None
+        ] + fresh(known, lambda comment: comment.source_id, existing(
+            Comment.objects.all(), 'source_id',
+            {comment.source_id for comment in known},
+        ))
+        Comment.objects.bulk_create(objs, ignore_conflicts=True)
+        self.touched['posts'].update(comment.post_id for comment in objs)
+        return objs
+
+    def existing_follows(self, objs):
+        user_ids = sorted({follow.user_id for follow in objs})
+        author_ids = sorted({follow.author_id for follow in objs})
+        found = set()
+        for users in batches(user_ids, MAX_PARAMS // 2):
+            for authors in batches(author_ids, MAX_PARAMS // 2):
+                found.update(Follow.objects.filter(
+                    user_id__in=users, author_id__in=authors
+                ).values_list('user_id', 'author_id'))
+        return found
+
+    def save_follows(self, objs):
+        objs = fresh(
+            objs, lambda follow: (follow.user_id, follow.author_id),
+            self.existing_follows(objs),
+        )
+        Follow.objects.bulk_create(objs, ignore_conflicts=True)
+        for follow in objs:
+            self.touched['users'].update((follow.user_id, follow.author_id))
+            self.touched['followers'].add(follow.user_id)
+        forget_followees({follow.user_id for follow in objs})
+        followers_of = {}
+        for follow in objs:
+            followers_of.setdefault(follow.author_id, []).append(
+                follow.user_id
+            )
+        posts = Post.objects.filter(
+            author_id__in=followers_of
+        ).values_list('id', 'author_id', 'pub_date')
+        bulk_insert(Timeline, (
+            Timeline(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, author_id, pub_date in posts.iterator()
+            for user_id in followers_of[author_id]
+        ), self.batch_size)
+        return objs
+
+    def ingest_image(self, source):
+        """Копирует картинку поста в хранилище; выполняется в потоках."""
+        if not source:
+            return None
+        name = 'posts/' + os.path.basename(source.split('?')[0])
+        try:
+            if source.startswith(('http://', 'https://')):
+                with urllib.request.urlopen(source, timeout=30) as response:
+                    content = response.read()
+            else:
+                path = os.path.join(self.media_dir or '', source)
+                with open(path, 'rb') as image:
+                    content = image.read()
+            return default_storage.save(name, ContentFile(content))
+        except OSError:
+            logger.warning('Не удалось загрузить картинку %s', source)
+            return None
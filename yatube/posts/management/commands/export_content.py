@@ -0,0 +1,59 @@
+import gzip
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporter import (EXPORT_TYPES, InvalidWatermark, export_lines,
+                            parse_watermark)
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты, комментарии и подписки в NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type', choices=EXPORT_TYPES, action='append', dest='kinds',
+            help='Тип записей; по умолчанию все',
+        )
+        parser.add_argument(
+            '--since',
+            help='Выгрузить только посты и комментарии новее этой даты '
+                 '(ISO 8601); подписки выгружаются целиком',
+        )
+        parser.add_argument(
+            '--output', help='Файл для выгрузки; по умолчанию stdout',
+        )
+        parser.add_argument(
+            '--gzip', action='store_true', dest='compress',
+            help='Сжать выгрузку gzip; требует --output',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из базы за раз',
+        )
+
+    def handle(self, *args, kinds, since, output, compress, chunk_size,
+               **options):
+        if compress and not output:
+            raise CommandError('Для --gzip нужен --output')
+        try:
+            since = parse_watermark(since)
+        except InvalidWatermark as e:
+            raise CommandError(str(e))
+        lines = export_lines(kinds or EXPORT_TYPES, since, chunk_size)
+        if not output:
+            count = self.write(self.stdout, lines)
+        elif compress:
+            with gzip.open(output, 'wt', encoding='utf-8') as stream:
+                count = self.write(stream, lines)
+        else:
+            with open(output, 'w', encoding='utf-8') as stream:
+                count = self.write(stream, lines)
+        self.stderr.write(f'Выгружено записей: {count}')
+
+    @staticmethod
+    def write(stream, lines):
+        count = 0
+        for line in lines:
+            stream.write(line)
+            count += 1
+        return count
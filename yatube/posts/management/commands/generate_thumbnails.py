@@ -0,0 +1,51 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+
+def init_worker():
+    django.setup()
+    # соединения родителя не должны использоваться в дочерних процессах
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры для уже загруженных картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число параллельных процессов',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=50,
+            help='Сколько картинок передавать процессу за раз',
+        )
+
+    def handle(self, *args, workers, chunk_size, **options):
+        images = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct()
+        images = list(images.iterator())
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=init_worker
+        ) as executor:
+            failed = [
+                name for name in executor.map(
+                    generate_thumbnails, images, chunksize=chunk_size
+                )
+                if name
+            ]
+        for name in failed:
+            self.stderr.write(f'Не удалось обработать {name}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {len(images) - len(failed)} '
+            f'из {len(images)}'
+        ))
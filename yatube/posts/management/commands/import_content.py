@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import RECORD_TYPES, Importer, InvalidRecord, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует пользователей, группы, посты, комментарии и подписки '
+        'из NDJSON или CSV (в том числе .gz)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='+',
+            help='Файлы в порядке: пользователи, группы, посты, '
+                 'комментарии, подписки',
+        )
+        parser.add_argument(
+            '--type', choices=RECORD_TYPES, dest='record_type',
+            help='Тип записей для файлов без поля type (например, CSV)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько записей вставлять одним bulk_create',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='Число потоков для загрузки картинок',
+        )
+        parser.add_argument(
+            '--media-dir',
+            help='Каталог, относительно которого заданы пути картинок',
+        )
+
+    def handle(self, *args, files, record_type, batch_size, workers,
+               media_dir, **options):
+        importer = Importer(batch_size, workers, media_dir)
+        try:
+            for path in files:
+                for kind, row in read_records(path, record_type):
+                    importer.add(kind, row)
+        except (InvalidRecord, ValueError) as e:
+            raise CommandError(f'{path}: {e}')
+        finally:
+            stats = importer.finish()
+        for kind in RECORD_TYPES:
+            self.stdout.write(
+                f'{kind}: обработано {stats[kind]}, '
+                f'пропущено {stats[kind + "_skipped"]}, '
+                f'уже были в базе {stats[kind + "_existing"]}'
+            )
+        self.stdout.write(self.style.SUCCESS('Импорт завершён'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount_posts, recount_users
+from posts.models import Post, User
+from posts.signals import iterate_batches
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько записей пересчитывать одним запросом',
+        )
+
+    def handle(self, *args, batch_size, **options):
+        users = 0
+        for user_ids in iterate_batches(
+            User.objects.all(), 'id', batch_size=batch_size
+        ):
+            recount_users(user_ids)
+            users += len(user_ids)
+        posts = 0
+        for post_ids in iterate_batches(
+            Post.objects.all(), 'id', batch_size=batch_size
+        ):
+            recount_posts(post_ids)
+            posts += len(post_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано пользователей: {users}, постов: {posts}'
+        ))
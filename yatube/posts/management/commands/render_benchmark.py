@@ -0,0 +1,88 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template import Context, Engine, engines
+
+from core.templatetags.cached_urls import _reverse
+from posts.cards import CARD_TEMPLATE
+from posts.models import Group, Post, User
+
+
+def sample_posts(count):
+    """Посты в памяти: замеряется только отрисовка, без базы."""
+    groups = [
+        Group(id=i, slug=f'group-{i}', title=f'Группа {i}') for i in range(5)
+    ]
+    authors = [
+        User(id=i, username=f'author_{i}', first_name='Имя')
+        for i in range(20)
+    ]
+    posts = []
+    for i in range(count):
+        post = Post(
+            id=i + 1,
+            text='Текст поста ' * 20,
+            author=authors[i % len(authors)],
+            group=groups[i % len(groups)] if i % 3 else None,
+        )
+        post.thumbnail_url = None
+        posts.append(post)
+    return posts
+
+
+def uncached_engine():
+    """Движок без cached.Loader: шаблон читается и компилируется
+    при каждой отрисовке, как с DEBUG и без настройки loaders."""
+    engine = engines['django'].engine
+    return Engine(
+        dirs=engine.dirs,
+        loaders=[
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ],
+        debug=engine.debug,
+        libraries=engine.libraries,
+        builtins=list(engine.builtins),
+    )
+
+
+class Command(BaseCommand):
+    help = 'Замеряет время отрисовки карточки поста'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cards', type=int, default=500,
+            help='Число разных карточек',
+        )
+        parser.add_argument(
+            '--rounds', type=int, default=5,
+            help='Сколько раз отрисовать каждую карточку',
+        )
+
+    def handle(self, *args, cards, rounds, **options):
+        posts = sample_posts(cards)
+        variants = {
+            # без кэша шаблонов и без запоминания ссылок
+            'compile': (uncached_engine(), False),
+            # cached.Loader, ссылки вычисляются для каждой карточки
+            'cached': (engines['django'].engine, False),
+            # cached.Loader и запомненные ссылки
+            'memo': (engines['django'].engine, True),
+        }
+        self.stdout.write(f'{"вариант":<8} {"мкс/карточка":>13}')
+        for name, (engine, memoize) in variants.items():
+            _reverse.cache_clear()
+            # первая отрисовка компилирует шаблон в cached.Loader
+            engine.get_template(CARD_TEMPLATE)
+            started = time.perf_counter()
+            for _ in range(rounds):
+                for post in posts:
+                    if not memoize:
+                        _reverse.cache_clear()
+                    engine.get_template(CARD_TEMPLATE).render(Context({
+                        'post': post, 'show_author': True,
+                    }))
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{name:<8} {elapsed / (cards * rounds) * 1e6:>13.1f}'
+            )
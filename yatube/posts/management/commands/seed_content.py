@@ -0,0 +1,84 @@
+import tempfile
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+
+from posts.importer import RECORD_TYPES, Importer
+from posts.models import User
+from posts.seeding import seed_records
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'подписками, комментариями и картинками для нагрузочных тестов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000, help='Число пользователей',
+        )
+        parser.add_argument(
+            '--groups', type=int, default=20, help='Число групп',
+        )
+        parser.add_argument(
+            '--posts', type=float, default=10,
+            help='Среднее число постов на пользователя (закон Парето)',
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.5,
+            help='Показатель распределения Парето: чем меньше, тем больше '
+                 'постов у самых активных авторов',
+        )
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Число подписок на пользователя',
+        )
+        parser.add_argument(
+            '--comments', type=float, default=2,
+            help='Среднее число комментариев на пост',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.1,
+            help='Доля постов с картинкой',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределены даты постов',
+        )
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Префикс имён пользователей и slug групп',
+        )
+        parser.add_argument(
+            '--password', default='seed-password',
+            help='Пароль всех созданных пользователей',
+        )
+        parser.add_argument(
+            '--seed', type=int, help='Зерно генератора случайных чисел',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, prefix, password, batch_size, **options):
+        options = {
+            name: options[name] for name in (
+                'users', 'groups', 'posts', 'alpha', 'follows', 'comments',
+                'images', 'days', 'seed',
+            )
+        }
+        with tempfile.TemporaryDirectory() as image_dir:
+            importer = Importer(batch_size, media_dir=image_dir)
+            try:
+                for kind, row in seed_records(
+                    prefix=prefix, image_dir=image_dir, **options
+                ):
+                    importer.add(kind, row)
+            finally:
+                stats = importer.finish()
+        # хешируем пароль один раз: PBKDF2 на каждого занял бы минуты
+        User.objects.filter(username__startswith=f'{prefix}_user_').update(
+            password=make_password(password)
+        )
+        for kind in RECORD_TYPES:
+            self.stdout.write(f'{kind}: {stats[kind]}')
+        self.stdout.write(self.style.SUCCESS('Данные созданы'))
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:59
+from importlib import import_module
+
+from django.db import migrations, models
+
+# SQLite добавляет поле пересозданием posts_post, при этом пропадают
+# триггеры полнотекстового индекса; индекс создаётся заново
+fts = import_module('posts.migrations.0016_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            fts.run_on_sqlite(fts.DROP_FTS), fts.run_on_sqlite(fts.CREATE_FTS)
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения поста'),
+        ),
+        migrations.RunPython(
+            fts.run_on_sqlite(fts.CREATE_FTS), fts.run_on_sqlite(fts.DROP_FTS)
+        ),
+    ]
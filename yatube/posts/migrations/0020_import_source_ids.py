@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:07
+from importlib import import_module
+
+from django.db import migrations, models
+
+# SQLite добавляет поле пересозданием posts_post, при этом пропадают
+# триггеры полнотекстового индекса; индекс создаётся заново
+fts = import_module('posts.migrations.0016_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_timeline_cursor_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='source_id',
+            field=models.BigIntegerField(editable=False, null=True, unique=True, verbose_name='id в источнике импорта'),
+        ),
+        migrations.RunPython(
+            fts.run_on_sqlite(fts.DROP_FTS), fts.run_on_sqlite(fts.CREATE_FTS)
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='source_id',
+            field=models.BigIntegerField(editable=False, null=True, unique=True, verbose_name='id в источнике импорта'),
+        ),
+        migrations.RunPython(
+            fts.run_on_sqlite(fts.CREATE_FTS), fts.run_on_sqlite(fts.DROP_FTS)
+        ),
+    ]
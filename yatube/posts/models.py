@@ -34,9 +34,44 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество комментариев'
+    )
+    # момент последнего изменения того, что выводится в карточке поста
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения поста'
+    )
+    # id поста в источнике import_content: по нему на пост ссылаются
+    # импортируемые комментарии, а повторный импорт его пропускает
+    source_id = models.BigIntegerField(
+        null=True,
+        unique=True,
+        editable=False,
+        verbose_name='id в источнике импорта'
+    )
 
     class Meta:
         ordering = ['-pub_date']
+        # индексы лент: id добивает порядок курсорной пагинации
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+            # покрывающий индекс для валидаторов условного GET
+            models.Index(fields=['updated'], name='post_updated_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -71,11 +106,23 @@ class Comment(models.Model):
     created = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Создан')
+    # id комментария в источнике import_content
+    source_id = models.BigIntegerField(
+        null=True,
+        unique=True,
+        editable=False,
+        verbose_name='id в источнике импорта')
 
     class Meta:
         ordering = ['-created']
         verbose_name_plural = 'Коментарии'
         verbose_name = 'Коментарий'
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -96,9 +143,97 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписки'
         verbose_name_plural = 'Подписки'
+        # подписчики автора по порядку id при раскладке постов по лентам
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 name='unique_follow',
                 fields=['user', 'author'],
             )
         ]
+
+
+class Timeline(models.Model):
+    """Лента подписок, заполняемая при публикации поста (fan-out on write).
+
+    Строка означает, что пост автора попал в ленту подписчика; pub_date
+    продублирован из поста, чтобы лента читалась одним проходом по индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор поста'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата создания поста')
+
+    class Meta:
+        verbose_name = 'Лента подписок'
+        verbose_name_plural = 'Ленты подписок'
+        indexes = [
+            # post добивает дату в ключе курсора ленты подписок
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_timeline_post',
+                fields=['user', 'post'],
+            )
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, поддерживаемые сигналами.
+
+    Позволяют выводить число постов и подписок без COUNT(*).
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество постов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписок'
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user)
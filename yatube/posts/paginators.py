@@ -0,0 +1,274 @@
+import base64
+import binascii
+import datetime
+from math import ceil
+
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=timezone.utc)
+# диапазон INTEGER в SQLite и BIGINT в PostgreSQL
+MAX_INT = 2 ** 63 - 1
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _position(obj, field, tiebreak='id'):
+    """Ключ (дата, id) для модели или словаря из values()."""
+    if isinstance(obj, dict):
+        return obj[field], obj[tiebreak]
+    return getattr(obj, field), getattr(obj, tiebreak)
+
+
+def pack_cursor(*parts):
+    """Упаковывает значения позиции в непрозрачный токен."""
+    raw = ':'.join(str(part) for part in parts).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def db_int(value):
+    """int, который помещается в целочисленный столбец базы."""
+    number = int(value)
+    if not -MAX_INT <= number <= MAX_INT:
+        raise ValueError(value)
+    return number
+
+
+def unpack_cursor(token, *types):
+    """Распаковывает токен, приводя части к типам types."""
+    padding = '=' * (-len(token) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(token + padding).decode()
+        parts = raw.split(':')
+        if len(parts) != len(types):
+            raise ValueError(raw)
+        return tuple(cast(part) for cast, part in zip(types, parts))
+    except (binascii.Error, UnicodeDecodeError, ValueError, OverflowError):
+        raise InvalidCursor('Некорректный курсор')
+
+
+def encode_cursor(obj, field='pub_date', tiebreak='id'):
+    """Непрозрачный токен позиции записи в ленте."""
+    moment, pk = _position(obj, field, tiebreak)
+    microseconds = (moment - EPOCH) // datetime.timedelta(microseconds=1)
+    return pack_cursor(microseconds, pk)
+
+
+def decode_cursor(token):
+    microseconds, pk = unpack_cursor(token, int, db_int)
+    try:
+        moment = EPOCH + datetime.timedelta(microseconds=microseconds)
+    except OverflowError:
+        # дата за пределами datetime
+        raise InvalidCursor('Некорректный курсор')
+    return moment, pk
+
+
+class FeedPaginator(Paginator):
+    """Пагинатор с заранее известным числом записей.
+
+    Число берётся из счётчиков или кэша, а не из COUNT(*). Оно может
+    быть оценкой снизу (exact=False) или устаревшим, поэтому страница
+    выбирается с одной лишней записью: по ней видно, есть ли
+    продолжение, а на последней странице число становится точным.
+    """
+    # сколько соседних страниц показывать по обе стороны от текущей
+    window = 3
+
+    def __init__(self, object_list, per_page, count, exact=True,
+                 recount=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+        self.exact = exact
+        # точный подсчёт, когда без него не обойтись (page=last)
+        self.recount = recount or self.object_list.order_by().count
+        self.recounted = False
+        self.number = 1
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def num_pages(self):
+        if self.count == 0 and not self.allow_empty_first_page:
+            return 0
+        return ceil(max(1, self.count - self.orphans) / self.per_page)
+
+    def make_exact(self):
+        if not self.recounted:
+            self._count = self.recount()
+            self.exact = self.recounted = True
+
+    def validate_number(self, number):
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        if number > self.num_pages:
+            # число может быть оценкой снизу или устаревшим: номер
+            # сверяется с пересчётом, а огромный номер не доходит до OFFSET
+            self.make_exact()
+        if number > self.num_pages:
+            if number == 1 and self.allow_empty_first_page:
+                pass
+            else:
+                raise EmptyPage(_('That page contains no results'))
+        return number
+
+    def page(self, number):
+        last = number == 'last'
+        if last and not self.exact:
+            self.make_exact()
+        if last:
+            number = self.num_pages
+        number = self.validate_number(number)
+        # с оценкой снизу конец ленты неизвестен
+        if self.exact and self.near_end(number):
+            # смещение от конца верно только при точном числе: счётчик
+            # или кэш могли устареть, поэтому число сверяется с пересчётом
+            # (из кэша области, если он уже точный)
+            self.make_exact()
+            if last:
+                number = self.num_pages
+            if self.near_end(number):
+                page = self._page_from_end(number)
+                if page is not None:
+                    return page
+        return self._page_from_start(number)
+
+    def near_end(self, number):
+        bottom = (number - 1) * self.per_page
+        top = min(bottom + self.per_page, self.count)
+        return bottom < top and self.count - top < bottom
+
+    def _page_from_start(self, number):
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and (number > 1 or not self.allow_empty_first_page):
+            raise EmptyPage(_('That page contains no results'))
+        if len(rows) > self.per_page:
+            self._count = max(self._count, bottom + len(rows))
+        else:
+            self._count = bottom + len(rows)
+            self.exact = True
+        self.number = number
+        return self._get_page(rows[:self.per_page], number, self)
+
+    def _page_from_end(self, number):
+        """Страница ближе к концу ленты: обратный порядок индекса
+        с небольшим OFFSET от конца, а не огромным от начала.
+
+        None, если выборка не сходится с числом записей.
+        """
+        bottom = (number - 1) * self.per_page
+        top = min(bottom + self.per_page, self.count)
+        rows = list(
+            self.object_list.reverse()[self.count - top:self.count - bottom]
+        )
+        if len(rows) < top - bottom:
+            # записей меньше, чем насчитано: страница читается с начала,
+            # и там же число поправляется
+            return None
+        rows.reverse()
+        self.number = number
+        return self._get_page(rows, number, self)
+
+    @property
+    def page_window(self):
+        """Номера страниц вокруг текущей для виджета пагинации."""
+        first = max(1, self.number - self.window)
+        last = min(self.num_pages, self.number + self.window)
+        return range(first, last + 1)
+
+    @property
+    def has_more_pages(self):
+        """Есть ли страницы правее окна."""
+        return not self.exact or self.page_window[-1] < self.num_pages
+
+
+class CursorPage(Page):
+    """Страница ленты, адресуемая курсором вместо номера."""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return self.paginator.encode(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return self.paginator.encode(self.object_list[0])
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (дата, id), по умолчанию (pub_date, id).
+
+    Страница выбирается условием по индексу и LIMIT, без COUNT(*)
+    и OFFSET, поэтому глубокие страницы стоят столько же, сколько первая.
+    Записи идут от новых к старым; id добивает ключ, чтобы позиция
+    записи была однозначной. Ключ может быть и другим, например
+    аннотациями со столбцами строки ленты подписок: tiebreak задаёт
+    поле, которое добивает дату.
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date',
+                 tiebreak='id', **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.field = field
+        self.tiebreak = tiebreak
+
+    def encode(self, obj):
+        return encode_cursor(obj, self.field, self.tiebreak)
+
+    def _seek(self, queryset, token, direction):
+        moment, pk = decode_cursor(token)
+        field, tiebreak = self.field, self.tiebreak
+        return queryset.filter(
+            Q(**{f'{field}__{direction}': moment})
+            | Q(**{field: moment, f'{tiebreak}__{direction}': pk})
+        )
+
+    def cursor_page(self, after=None, before=None):
+        queryset = self.object_list
+        if before is not None:
+            queryset = self._seek(queryset, before, 'gt').order_by(
+                self.field, self.tiebreak
+            )
+        else:
+            queryset = queryset.order_by(f'-{self.field}', f'-{self.tiebreak}')
+            if after is not None:
+                queryset = self._seek(queryset, after, 'lt')
+        # берём на одну запись больше, чтобы узнать, есть ли продолжение
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if before is not None:
+            rows.reverse()
+            return CursorPage(rows, self, True, has_more)
+        return CursorPage(rows, self, has_more, after is not None)
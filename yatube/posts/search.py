@@ -0,0 +1,83 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .paginators import db_int, pack_cursor, unpack_cursor
+
+FTS_TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+
+
+def match_expression(query):
+    """Запрос пользователя как выражение MATCH для FTS5.
+
+    Каждое слово ищется по префиксу, слова объединяются через AND;
+    синтаксис FTS5 из ввода не интерпретируется.
+    """
+    words = WORD.findall(query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def uses_fts():
+    return connection.vendor == 'sqlite'
+
+
+def matching_ids(query):
+    """Подзапрос с id постов, подходящих под запрос (без ранжирования)."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match_expression(query)],
+    )
+
+
+def search_page(query, limit, after=None):
+    """Страница результатов поиска, от более релевантных к менее.
+
+    Возвращает посты страницы и токен следующей страницы. Позиция
+    в выдаче — пара (ранг bm25, id), поэтому следующая страница
+    выбирается условием, а не OFFSET.
+    """
+    match = match_expression(query)
+    if not match:
+        return [], None
+    if not uses_fts():
+        return _like_page(query, limit, after)
+    sql = (
+        f'SELECT rowid, rank FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s'
+    )
+    params = [match]
+    if after is not None:
+        rank, pk = unpack_cursor(after, float, db_int)
+        sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+        params += [rank, rank, pk]
+    sql += ' ORDER BY rank, rowid LIMIT %s'
+    params.append(limit + 1)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return _page(rows, limit)
+
+
+def _like_page(query, limit, after):
+    # без FTS5 поиск идёт подстрокой, порядок — по id
+    posts = Post.objects.filter(text__icontains=query).order_by('id')
+    if after is not None:
+        _, pk = unpack_cursor(after, float, db_int)
+        posts = posts.filter(id__gt=pk)
+    rows = [(pk, 0.0) for pk in posts.values_list('id', flat=True)[:limit + 1]]
+    return _page(rows, limit)
+
+
+def _page(rows, limit):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        pk, rank = rows[-1]
+        next_cursor = pack_cursor(repr(rank), pk)
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [pk for pk, _ in rows]
+    )
+    return [posts[pk] for pk, _ in rows if pk in posts], next_cursor
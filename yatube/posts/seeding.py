@@ -0,0 +1,110 @@
+import datetime
+import os
+import random
+
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from .models import Comment, Post
+
+WORDS = (
+    'котик лето море город книга кофе утро дорога музыка друзья поезд '
+    'горы осень снег закат фото прогулка ужин работа выходные'
+).split()
+
+
+def text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def write_images(directory, count, rng):
+    """Несколько разных картинок, которые посты делят между собой."""
+    names = []
+    for i in range(count):
+        name = f'seed_{i}.png'
+        color = tuple(rng.randrange(256) for _ in range(3))
+        Image.new('RGB', (960, 640), color).save(
+            os.path.join(directory, name)
+        )
+        names.append(name)
+    return names
+
+
+def posts_per_user(rng, users, mean, alpha):
+    """Число постов у каждого пользователя по закону Парето:
+    немногие авторы пишут большую часть постов."""
+    scale = mean * (alpha - 1) / alpha
+    return [int(scale * rng.paretovariate(alpha)) for _ in range(users)]
+
+
+def seed_records(users=1000, groups=20, posts=10, follows=20, comments=2,
+                 images=0.1, days=365, prefix='seed', image_dir=None,
+                 alpha=1.5, seed=None):
+    """Записи для Importer: пользователи, группы, посты, подписки
+    и комментарии синтетического социального графа.
+
+    posts и comments — средние числа постов на пользователя
+    и комментариев на пост, follows — подписок на пользователя.
+    На авторов с большим числом постов подписываются чаще.
+    """
+    rng = random.Random(seed)
+    usernames = [f'{prefix}_user_{i}' for i in range(users)]
+    slugs = [f'{prefix}-group-{i}' for i in range(groups)]
+    for username in usernames:
+        yield 'user', {'username': username, 'first_name': text(rng, 1)}
+    for slug in slugs:
+        yield 'group', {
+            'slug': slug, 'title': text(rng, 2), 'description': text(rng, 8)
+        }
+
+    counts = posts_per_user(rng, users, posts, alpha)
+    authors = [
+        author for author, count in enumerate(counts) for _ in range(count)
+    ]
+    rng.shuffle(authors)
+    image_names = (
+        write_images(image_dir, 8, rng) if image_dir and images else []
+    )
+    # id в источнике: импорт сохраняет их в source_id
+    first_id = (
+        Post.objects.aggregate(last=Max('source_id'))['last'] or 0
+    ) + 1
+    start = timezone.now() - datetime.timedelta(days=days)
+    step = datetime.timedelta(days=days) / max(len(authors), 1)
+    for number, author in enumerate(authors):
+        post = {
+            'id': first_id + number,
+            'text': text(rng, rng.randint(5, 60)),
+            'author': usernames[author],
+            'pub_date': (start + step * number).isoformat(),
+        }
+        if slugs and rng.random() < 0.7:
+            post['group'] = rng.choice(slugs)
+        if image_names and rng.random() < images:
+            post['image'] = rng.choice(image_names)
+        yield 'post', post
+
+    popularity = [count + 1 for count in counts]
+    for user, username in enumerate(usernames):
+        followed = set(rng.choices(
+            range(users), popularity, k=min(follows, users - 1)
+        ))
+        followed.discard(user)
+        for author in followed:
+            yield 'follow', {'user': username, 'author': usernames[author]}
+
+    first_comment = (
+        Comment.objects.aggregate(last=Max('source_id'))['last'] or 0
+    ) + 1
+    number = 0
+    for post in range(len(authors)):
+        for _ in range(int(rng.expovariate(1 / comments)) if comments else 0):
+            yield 'comment', {
+                'id': first_comment + number,
+                'post': first_id + post,
+                'author': rng.choice(usernames),
+                'text': text(rng, rng.randint(3, 20)),
+                'created': (start + step * (post + 1)).isoformat(),
+            }
+            number += 1
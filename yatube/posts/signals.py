@@ -0,0 +1,268 @@
+import threading
+
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.after_response import defer
+from yatube.settings import TIMELINE_BATCH_SIZE
+
+from .cards import invalidate_cards
+from .counters import (bump_post, bump_user, bump_users, recount_posts,
+                       recount_users)
+from .follow_graph import forget_followees
+from .generations import (EPOCH, GLOBAL, author_scope, bump_generations,
+                          follower_scope, group_scope)
+from .models import Comment, Follow, Group, Post, Timeline, User, UserStats
+
+# родители, удаляемые сейчас каскадом: пока Django удаляет зависимые
+# записи, их построчные обработчики ничего не делают, а счётчики
+# и ленты пересчитываются один раз после удаления родителя
+_deleting = threading.local()
+
+
+def deleting(kind):
+    if not hasattr(_deleting, kind):
+        setattr(_deleting, kind, {})
+    return getattr(_deleting, kind)
+
+
+def batches(ids, batch_size=TIMELINE_BATCH_SIZE):
+    for i in range(0, len(ids), batch_size):
+        yield ids[i:i + batch_size]
+
+
+def iterate_batches(queryset, field, *fields, batch_size=TIMELINE_BATCH_SIZE):
+    """Отдаёт строки values_list(field, *fields) пачками по возрастанию
+    field, без OFFSET. Без дополнительных полей строки плоские."""
+    flat = not fields
+    last = None
+    while True:
+        batch = queryset.order_by(field)
+        if last is not None:
+            batch = batch.filter(**{f'{field}__gt': last})
+        batch = list(
+            batch.values_list(field, *fields, flat=flat)[:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        last = batch[-1] if flat else batch[-1][0]
+
+
+def post_scopes(post):
+    """Области лент, в которые пост попадает сам по себе."""
+    scopes = [GLOBAL, author_scope(post.author_id)]
+    if post.group_id:
+        scopes.append(group_scope(post.group.slug))
+    return scopes
+
+
+def bump_followers(author_id):
+    """Меняет поколения лент всех подписчиков автора."""
+    followers = Follow.objects.filter(author_id=author_id)
+    for user_ids in iterate_batches(followers, 'user_id'):
+        bump_generations(follower_scope(user_id) for user_id in user_ids)
+
+
+def fan_out_post(post_id):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Выполняется после ответа на запрос, поэтому пост читается заново:
+    к этому времени его могли удалить или откатить транзакцию.
+    """
+    post = Post.objects.filter(id=post_id).only(
+        'id', 'author_id', 'pub_date'
+    ).first()
+    if post is None:
+        return
+    followers = Follow.objects.filter(author_id=post.author_id)
+    for user_ids in iterate_batches(followers, 'user_id'):
+        bump_generations(follower_scope(user_id) for user_id in user_ids)
+        Timeline.objects.bulk_create(
+            [
+                Timeline(
+                    user_id=user_id,
+                    post_id=post.id,
+                    author_id=post.author_id,
+                    pub_date=post.pub_date,
+                )
+                for user_id in user_ids
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def backfill_timeline(user_id, author_ids):
+    """Добавляет в ленту подписчика уже опубликованные посты авторов."""
+    posts = Post.objects.filter(author_id__in=author_ids)
+    for rows in iterate_batches(posts, 'id', 'author_id', 'pub_date'):
+        Timeline.objects.bulk_create(
+            [
+                Timeline(
+                    user_id=user_id,
+                    post_id=post_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+                for post_id, author_id, pub_date in rows
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def followed(user_id, author_ids):
+    """Последствия новых подписок: счётчики, граф подписок и лента."""
+    bump_users(author_ids, followers_count=1)
+    bump_user(user_id, following_count=len(author_ids))
+    forget_followees([user_id])
+    backfill_timeline(user_id, author_ids)
+    bump_generations([follower_scope(user_id)])
+
+
+def unfollowed(user_id, author_ids):
+    """Последствия удалённых подписок."""
+    bump_users(author_ids, followers_count=-1)
+    bump_user(user_id, following_count=-len(author_ids))
+    forget_followees([user_id])
+    Timeline.objects.filter(
+        user_id=user_id,
+        author_id__in=author_ids,
+    ).delete()
+    bump_generations([follower_scope(user_id)])
+
+
+def invalidate_cards_of(posts):
+    """Сбрасывает карточки постов и отмечает посты изменёнными,
+    чтобы сменились их валидаторы условного GET."""
+    for post_ids in iterate_batches(posts, 'id'):
+        invalidate_cards(post_ids)
+        Post.objects.filter(id__in=post_ids).update(updated=timezone.now())
+    # карточки могут быть в любых лентах
+    bump_generations([EPOCH])
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    invalidate_cards([instance.id])
+    if not created:
+        # правки редки, а пост может быть в любой ленте
+        bump_generations([EPOCH])
+        return
+    bump_generations(post_scopes(instance))
+    bump_user(instance.author_id, posts_count=1)
+    # у автора могут быть тысячи подписчиков: запрос на публикацию
+    # их не ждёт
+    defer(fan_out_post, instance.id)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    deleting('posts')[instance.id] = True
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    deleting('posts').pop(instance.id, None)
+    invalidate_cards([instance.id])
+    if instance.author_id in deleting('users'):
+        return
+    bump_user(instance.author_id, posts_count=-1)
+    # пост исчезает из всех лент, где был: их страницы и числа постов
+    # устаревают, а строки Timeline удалены каскадом
+    bump_generations(post_scopes(instance))
+    bump_followers(instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        bump_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if (
+        instance.post_id in deleting('posts')
+        or instance.author_id in deleting('users')
+    ):
+        return
+    bump_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_cards_of(instance.posts.all())
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    # после удаления группа у постов уже обнулена, сбрасываем заранее
+    invalidate_cards_of(instance.posts.all())
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+        return
+    # вход на сайт обновляет только last_login, карточки он не меняет
+    if update_fields == frozenset({'last_login'}):
+        return
+    invalidate_cards_of(instance.posts.all())
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        followed(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    users = deleting('users')
+    if instance.user_id in users or instance.author_id in users:
+        return
+    unfollowed(instance.user_id, [instance.author_id])
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    """Запоминает, чьи счётчики и ленты затронет удаление
+    пользователя вместе с его постами, комментариями и подписками."""
+    user_id = instance.id
+    deleting('users')[user_id] = {
+        'followers': list(Follow.objects.filter(
+            author_id=user_id
+        ).values_list('user_id', flat=True)),
+        'followees': list(Follow.objects.filter(
+            user_id=user_id
+        ).values_list('author_id', flat=True)),
+        'commented': list(Comment.objects.filter(
+            author_id=user_id
+        ).exclude(post__author_id=user_id).values_list(
+            'post_id', flat=True
+        ).distinct()),
+        'groups': list(Group.objects.filter(
+            posts__author_id=user_id
+        ).values_list('slug', flat=True).distinct()),
+    }
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    affected = deleting('users').pop(instance.id, None)
+    if affected is None:
+        return
+    followers = affected['followers']
+    for user_ids in batches(followers + affected['followees']):
+        recount_users(user_ids)
+    for post_ids in batches(affected['commented']):
+        recount_posts(post_ids)
+    forget_followees(followers + [instance.id])
+    bump_generations(
+        [GLOBAL, author_scope(instance.id)]
+        + [group_scope(slug) for slug in affected['groups']]
+        + [follower_scope(user_id) for user_id in followers]
+    )
@@ -0,0 +1,198 @@
+import json
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, Timeline, User
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            description='Описание тестовой группы',
+            slug='test-slug',
+        )
+        cls.author = User.objects.create(username='Test_author')
+        cls.reader = User.objects.create(username='Test_reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Текст поста №{i}', group=cls.group
+            )
+            for i in range(15)
+        ]
+        cls.post = cls.posts[-1]
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+
+    def setUp(self):
+        # граф подписок в кэше мог остаться от других тестов
+        cache.clear()
+        self.guest = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds_return_selected_fields(self):
+        """Ленты отдают только запрошенные поля и не трогают лишние таблицы."""
+        urls = [
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', kwargs={'slug': 'test-slug'}),
+            reverse(
+                'posts:api_profile', kwargs={'username': 'Test_author'}
+            ),
+            reverse('posts:api_follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.reader_client.get(
+                        url, {'fields': 'id,text'}
+                    )
+                self.assertEqual(response.status_code, 200)
+                results = response.json()['results']
+                self.assertEqual(len(results), 10)
+                self.assertEqual(
+                    results[0],
+                    {'id': self.post.id, 'text': self.post.text},
+                )
+                feed_sql = queries.captured_queries[-1]['sql']
+                self.assertNotIn('auth_user', feed_sql)
+                self.assertNotIn('posts_group', feed_sql)
+
+    def test_cursor_walks_whole_feed(self):
+        url = reverse('posts:api_index')
+        first = self.guest.get(url, {'fields': 'id'}).json()
+        second = self.guest.get(
+            url, {'fields': 'id', 'after': first['next']}
+        ).json()
+        ids = [item['id'] for item in first['results'] + second['results']]
+        self.assertEqual(ids, [post.id for post in reversed(self.posts)])
+        self.assertIsNone(second['next'])
+        previous = self.guest.get(
+            url, {'fields': 'id', 'before': second['previous']}
+        ).json()
+        self.assertEqual(previous['results'], first['results'])
+
+    def test_post_detail_and_comments(self):
+        response = self.guest.get(
+            reverse('posts:api_post_detail', kwargs={'pk': self.post.pk}),
+            {'fields': 'author,group,comments_count'},
+        )
+        self.assertEqual(response.json(), {
+            'author': 'Test_author',
+            'group': 'test-slug',
+            'comments_count': 1,
+        })
+        response = self.guest.get(
+            reverse('posts:api_comments', kwargs={'pk': self.post.pk}),
+            {'fields': 'text,author'},
+        )
+        self.assertEqual(
+            response.json()['results'],
+            [{'text': 'Комментарий', 'author': 'Test_reader'}],
+        )
+
+    def test_errors(self):
+        cases = [
+            (reverse('posts:api_index'), {'fields': 'id,password'}, 400),
+            (reverse('posts:api_index'), {'after': 'мусор'}, 400),
+            (
+                reverse('posts:api_group_list', kwargs={'slug': 'none'}),
+                {},
+                404,
+            ),
+            (reverse('posts:api_post_detail', kwargs={'pk': 0}), {}, 404),
+            (reverse('posts:api_follow_index'), {}, 401),
+        ]
+        for url, params, status in cases:
+            with self.subTest(url=url, params=params):
+                response = self.guest.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('error', response.json())
+
+    def test_follow_author_is_idempotent(self):
+        """Повторная подписка и отписка не ошибка, а changed = false."""
+        url = reverse(
+            'posts:api_profile_follow', kwargs={'username': 'Test_author'}
+        )
+        steps = [
+            ('delete', {'following': False, 'changed': True}, 0),
+            ('delete', {'following': False, 'changed': False}, 0),
+            ('post', {'following': True, 'changed': True}, 1),
+            ('post', {'following': True, 'changed': False}, 1),
+        ]
+        for method, state, followers in steps:
+            with self.subTest(method=method, state=state):
+                response = getattr(self.reader_client, method)(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), {
+                    'author': 'Test_author',
+                    'followers_count': followers,
+                    **state,
+                })
+                self.assertEqual(
+                    Follow.objects.filter(user=self.reader).count(),
+                    followers,
+                )
+        self.assertEqual(
+            Timeline.objects.filter(user=self.reader).count(),
+            len(self.posts),
+        )
+
+    def test_follow_bulk(self):
+        authors = [
+            User.objects.create(username=f'author_{i}') for i in range(3)
+        ]
+        Post.objects.create(author=authors[0], text='Текст нового автора')
+        names = [author.username for author in authors]
+        response = self.reader_client.post(
+            reverse('posts:api_follow_bulk'),
+            json.dumps({
+                'authors': names + ['Test_author', 'Test_reader', 'nobody'],
+            }),
+            content_type='application/json',
+        )
+        self.assertEqual(response.json(), {
+            'followed': names,
+            'following': sorted(names + ['Test_author']),
+            'missing': ['nobody'],
+        })
+        self.reader.stats.refresh_from_db()
+        self.assertEqual(self.reader.stats.following_count, 4)
+        for author in authors:
+            author.stats.refresh_from_db()
+            self.assertEqual(author.stats.followers_count, 1)
+        self.assertTrue(Timeline.objects.filter(
+            user=self.reader, author=authors[0]
+        ).exists())
+
+    def test_follow_action_errors(self):
+        bulk_url = reverse('posts:api_follow_bulk')
+        follow_url = reverse(
+            'posts:api_profile_follow', kwargs={'username': 'nobody'}
+        )
+        cases = [
+            (self.guest, bulk_url, {'authors': []}, 401),
+            (self.reader_client, bulk_url, {'names': []}, 400),
+            (self.reader_client, bulk_url, {'authors': [1, 2]}, 400),
+            (
+                self.reader_client,
+                bulk_url,
+                {'authors': [f'user_{i}' for i in range(51)]},
+                400,
+            ),
+            (self.reader_client, follow_url, {}, 404),
+        ]
+        for client, url, data, status in cases:
+            with self.subTest(url=url, data=data):
+                response = client.post(
+                    url, json.dumps(data), content_type='application/json'
+                )
+                self.assertEqual(response.status_code, status)
+                self.assertIn('error', response.json())
@@ -0,0 +1,113 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Comment, Follow, Post, User, UserStats
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Test_author')
+        cls.follower = User.objects.create(username='Test_follower')
+
+    def test_counters_follow_posts_comments_and_follows(self):
+        """Счётчики меняются при создании и удалении записей."""
+        post = Post.objects.create(text='Текст поста', author=self.author)
+        Post.objects.create(text='Ещё пост', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.follower, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.follower, author=self.author)
+        post.refresh_from_db()
+        author_stats = UserStats.objects.get(user=self.author)
+        follower_stats = UserStats.objects.get(user=self.follower)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(author_stats.posts_count, 2)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(follower_stats.following_count, 1)
+
+        comment.delete()
+        follow.delete()
+        post.delete()
+        author_stats.refresh_from_db()
+        follower_stats.refresh_from_db()
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 0)
+        self.assertEqual(follower_stats.following_count, 0)
+
+    def test_counters_do_not_go_below_zero(self):
+        """Удаление записей, созданных в обход сигналов, не уводит
+        счётчики ниже нуля."""
+        post = Post.objects.create(text='Текст поста', author=self.author)
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.follower, text='Комментарий')
+        ])
+        Follow.objects.bulk_create([
+            Follow(user=self.follower, author=self.author)
+        ])
+        Comment.objects.get(post=post).delete()
+        Follow.objects.get(user=self.follower).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 0
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.follower).following_count, 0
+        )
+        post.delete()
+
+    def test_cascade_delete_recounts_once(self):
+        """Удаление поста и пользователя не обрабатывает зависимые
+        записи по одной, а счётчики остальных остаются верными."""
+        author = User.objects.create(username='Deleted_author')
+        readers = [
+            User.objects.create(username=f'reader_{i}') for i in range(10)
+        ]
+        post = Post.objects.create(text='Текст поста', author=author)
+        other = Post.objects.create(text='Чужой пост', author=readers[0])
+        for reader in readers:
+            Follow.objects.create(user=reader, author=author)
+            Comment.objects.create(
+                post=post, author=reader, text='Комментарий'
+            )
+        Follow.objects.create(user=author, author=readers[1])
+        Comment.objects.create(
+            post=other, author=author, text='Комментарий'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            post.delete()
+        self.assertLess(len(queries), 10)
+        with CaptureQueriesContext(connection) as queries:
+            author.delete()
+        self.assertLess(len(queries), 25)
+        other.refresh_from_db()
+        self.assertEqual(other.comments_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=readers[1]).followers_count, 0
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=readers[2]).following_count, 0
+        )
+
+    def test_recount_command_repairs_counters(self):
+        """Команда recount_counters восстанавливает сбитые счётчики."""
+        post = Post.objects.create(text='Текст поста', author=self.author)
+        Comment.objects.create(
+            post=post, author=self.follower, text='Комментарий'
+        )
+        UserStats.objects.all().update(posts_count=100, following_count=7)
+        Post.objects.all().update(comments_count=0)
+        call_command('recount_counters', batch_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.follower).following_count, 0
+        )
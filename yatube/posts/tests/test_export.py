@@ -0,0 +1,91 @@
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ExportContentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Test_author')
+        cls.reader = User.objects.create(username='Test_reader')
+        cls.admin = User.objects.create(username='admin', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            description='Описание тестовой группы',
+            slug='test-slug',
+        )
+        cls.old_post = Post.objects.create(
+            text='Старый пост', author=cls.author, group=cls.group
+        )
+        cls.new_post = Post.objects.create(
+            text='Новый пост', author=cls.author
+        )
+        Comment.objects.create(
+            post=cls.new_post, author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def export(self, *args):
+        out = StringIO()
+        call_command('export_content', *args, stdout=out, stderr=StringIO())
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_export_records(self):
+        records = self.export()
+        self.assertEqual(
+            [record['type'] for record in records],
+            ['post', 'post', 'comment', 'follow'],
+        )
+        self.assertEqual(records[0]['text'], 'Старый пост')
+        self.assertEqual(records[0]['author'], 'Test_author')
+        self.assertEqual(records[0]['group'], 'test-slug')
+        self.assertEqual(records[2]['post'], self.new_post.id)
+        self.assertEqual(
+            records[3], {'type': 'follow', 'user': 'Test_reader',
+                         'author': 'Test_author'}
+        )
+
+    def test_incremental_export_since_watermark(self):
+        since = self.old_post.pub_date.isoformat()
+        records = self.export('--type', 'post', '--since', since)
+        self.assertEqual(
+            [record['id'] for record in records], [self.new_post.id]
+        )
+        with self.assertRaisesMessage(CommandError, 'Некорректная дата'):
+            self.export('--since', '2020-02-30T10:00')
+
+    def test_gzip_file_export(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.ndjson.gz')
+            call_command(
+                'export_content', '--output', path, '--gzip',
+                stderr=StringIO(),
+            )
+            with gzip.open(path, 'rt', encoding='utf-8') as export:
+                self.assertEqual(len(export.readlines()), 4)
+
+    def test_endpoint_is_admin_only_and_streams(self):
+        url = reverse('posts:export')
+        reader = Client()
+        reader.force_login(self.reader)
+        self.assertEqual(reader.get(url).status_code, 302)
+        admin = Client()
+        admin.force_login(self.admin)
+        response = admin.get(url, {'type': 'comment', 'gzip': '1'})
+        self.assertTrue(response.streaming)
+        lines = gzip.decompress(
+            b''.join(response.streaming_content)
+        ).decode().splitlines()
+        self.assertEqual(json.loads(lines[0])['text'], 'Комментарий')
+        for since in ('вчера', '2020-02-30T10:00'):
+            with self.subTest(since=since):
+                response = admin.get(url, {'since': since})
+                self.assertEqual(response.status_code, 400)
@@ -0,0 +1,151 @@
+import datetime
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from posts.generations import (EPOCH, GLOBAL, author_scope, follower_scope,
+                               get_generations, group_scope)
+from posts.models import (Comment, Follow, Group, Post, Timeline, User,
+                          UserStats)
+
+from .fix_data import TEMP_MEDIA_ROOT, small_gif
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportContentTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir.name, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def ndjson(self, name, records):
+        return self.write(
+            name, '\n'.join(json.dumps(record) for record in records)
+        )
+
+    def test_import_preserves_links_and_dates(self):
+        with open(os.path.join(self.dir.name, 'cat.gif'), 'wb') as image:
+            image.write(small_gif)
+        users = self.write(
+            'users.csv', 'username,first_name\nleo,Лев\nann,Анна\n'
+        )
+        content = self.ndjson('content.ndjson.gz', [
+            {'type': 'group', 'slug': 'cats', 'title': 'Котики'},
+            {'type': 'post', 'id': 10, 'text': 'Пост', 'author': 'leo',
+             'group': 'cats', 'pub_date': '2020-01-02T03:04:05+00:00',
+             'image': 'cat.gif'},
+            {'type': 'post', 'id': 11, 'text': 'Без автора',
+             'author': 'nobody'},
+            {'type': 'comment', 'post': 10, 'author': 'ann',
+             'text': 'Комментарий', 'created': '2020-01-03T00:00:00'},
+            {'type': 'follow', 'user': 'ann', 'author': 'leo'},
+        ])
+        out = StringIO()
+        call_command(
+            'import_content', users, content, '--type', 'user',
+            '--batch-size', '2', '--media-dir', self.dir.name, stdout=out,
+        )
+        post = Post.objects.get(source_id=10)
+        ann = User.objects.get(username='ann')
+        self.assertEqual(post.author.first_name, 'Лев')
+        self.assertEqual(post.group, Group.objects.get(slug='cats'))
+        self.assertEqual(
+            post.pub_date,
+            datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        )
+        self.assertTrue(post.image.name.startswith('posts/cat'))
+        self.assertFalse(Post.objects.filter(source_id=11).exists())
+        self.assertEqual(Comment.objects.get(post=post).author, ann)
+        self.assertTrue(Follow.objects.filter(user=ann, author=post.author))
+        self.assertTrue(Timeline.objects.filter(user=ann, post=post))
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.author.stats.posts_count, 1)
+        self.assertEqual(ann.stats.following_count, 1)
+        self.assertIn('post: обработано 1, пропущено 1', out.getvalue())
+
+    def test_repeated_import_is_idempotent(self):
+        ann = User.objects.create_user(username='ann')
+        content = self.ndjson('content.ndjson', [
+            {'type': 'user', 'username': 'leo'},
+            {'type': 'post', 'id': 10, 'text': 'Пост', 'author': 'leo'},
+            {'type': 'comment', 'id': 5, 'post': 10, 'author': 'ann',
+             'text': 'Комментарий'},
+            {'type': 'follow', 'user': 'ann', 'author': 'leo'},
+        ])
+        call_command('import_content', content, stdout=StringIO())
+        out = StringIO()
+        call_command('import_content', content, stdout=out)
+        self.assertEqual(User.objects.filter(username='leo').count(), 1)
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Timeline.objects.filter(user=ann).count(), 1)
+        self.assertEqual(Post.objects.get().comments_count, 1)
+        for kind in ('post', 'comment', 'follow'):
+            self.assertIn(
+                f'{kind}: обработано 0, пропущено 0, уже были в базе 1',
+                out.getvalue(),
+            )
+
+    def test_source_ids_do_not_collide_with_local_posts(self):
+        """id из источника не совпадает с локальными: пост получает
+        свой id, а комментарии — именно этот пост."""
+        leo = User.objects.create_user(username='leo')
+        bob = User.objects.create_user(username='bob')
+        ann = User.objects.create_user(username='ann')
+        Follow.objects.create(user=ann, author=bob)
+        local = Post.objects.create(id=10, text='Местный', author=leo)
+        content = self.ndjson('content.ndjson', [
+            {'type': 'post', 'id': 10, 'text': 'Импортный', 'author': 'bob'},
+            {'type': 'comment', 'id': 1, 'post': 10, 'author': 'ann',
+             'text': 'Комментарий'},
+        ])
+        call_command('import_content', content, stdout=StringIO())
+        imported = Post.objects.get(source_id=10)
+        self.assertNotEqual(imported.id, local.id)
+        self.assertEqual(imported.author, bob)
+        self.assertEqual(Comment.objects.get().post, imported)
+        self.assertFalse(local.comments.exists())
+        self.assertTrue(Timeline.objects.filter(user=ann, post=imported))
+        self.assertEqual(UserStats.objects.get(user=bob).posts_count, 1)
+
+    def test_import_bumps_only_affected_feeds(self):
+        leo = User.objects.create_user(username='leo')
+        ann = User.objects.create_user(username='ann')
+        carl = User.objects.create_user(username='carl')
+        Group.objects.create(slug='cats', title='Котики')
+        Follow.objects.create(user=ann, author=leo)
+        scopes = [
+            EPOCH, GLOBAL, group_scope('cats'), author_scope(leo.id),
+            follower_scope(ann.id), author_scope(carl.id),
+            follower_scope(carl.id),
+        ]
+        before = get_generations(scopes)
+        content = self.ndjson('content.ndjson', [
+            {'type': 'post', 'id': 10, 'text': 'Пост', 'author': 'leo',
+             'group': 'cats'},
+        ])
+        call_command('import_content', content, stdout=StringIO())
+        changed = [
+            old != new for old, new in zip(before, get_generations(scopes))
+        ]
+        self.assertEqual(
+            changed, [False, True, True, True, True, False, False]
+        )
@@ -0,0 +1,90 @@
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from core.query_budget import get_query_budget
+from posts.models import Comment, Follow, Group, Post, User
+
+from .fix_data import TEMP_MEDIA_ROOT, small_gif
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class QueryBudgetTests(TestCase):
+    """Число SQL-запросов страниц не зависит от количества постов
+    и комментариев и не превышает бюджет, объявленный во view."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            description='Описание тестовой группы',
+            slug='test-slug',
+        )
+        cls.author = User.objects.create(username='Test_author')
+        cls.readers = [
+            User.objects.create(username=f'reader_{i}') for i in range(5)
+        ]
+        for reader in cls.readers:
+            Follow.objects.create(user=reader, author=cls.author)
+        for i in range(12):
+            post = Post.objects.create(
+                author=cls.author,
+                text=f'Текст поста №{i}',
+                group=cls.group,
+                image=SimpleUploadedFile(
+                    name=f'small_{i}.gif',
+                    content=small_gif,
+                    content_type='image/gif'
+                ),
+            )
+            for reader in cls.readers:
+                Comment.objects.create(
+                    post=post, author=reader, text='Комментарий'
+                )
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.readers[0])
+
+    def test_views_stay_within_query_budget(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse(
+                'posts:profile', kwargs={'username': self.author.username}
+            ),
+            reverse('posts:post_detail', kwargs={'pk': self.post.pk}),
+            reverse('posts:comments', kwargs={'pk': self.post.pk}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_create'),
+            reverse('posts:search') + '?q=Текст',
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', kwargs={'slug': self.group.slug}),
+            reverse(
+                'posts:api_profile', kwargs={'username': self.author.username}
+            ),
+            reverse('posts:api_follow_index'),
+            reverse('posts:api_post_detail', kwargs={'pk': self.post.pk}),
+            reverse('posts:api_comments', kwargs={'pk': self.post.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                budget = get_query_budget(resolve(url.split('?')[0]).func)
+                self.assertIsNotNone(budget, f'У {url} не задан бюджет')
+                # первый запрос создаёт миниатюры sorl, а кэш перед
+                # вторым очищается: измеряется запрос без готовых
+                # страниц, карточек и счётчиков
+                self.client.get(url)
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(
+                    len(queries), budget,
+                    '\n'.join(query['sql'] for query in queries),
+                )
@@ -0,0 +1,143 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+def bad_plan_steps(sql):
+    """Шаги плана запроса с просмотром таблицы или сортировкой.
+
+    Таблица должна читаться поиском по индексу (SEARCH). Просмотр
+    (SCAN), в том числе покрывающего индекса, допустим только
+    в запросе с LIMIT: он останавливается на границе страницы.
+    Просмотр вложенного запроса (SCAN subquery) не читает таблицу.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        steps = [row[-1] for row in cursor.fetchall()]
+    limited = re.search(r'\bLIMIT\b', sql) is not None
+    return [
+        step for step in steps
+        if 'TEMP B-TREE' in step
+        or (
+            step.startswith('SCAN')
+            and not step.startswith(('SCAN subquery', 'SCAN CONSTANT ROW'))
+            and not limited
+        )
+    ]
+
+
+class QueryPlanTests(TestCase):
+    """Запросы лент идут по индексам: без полного просмотра таблиц
+    и без сортировки во временном B-дереве."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', description='Описание', slug=f'group-{i}'
+            )
+            for i in range(3)
+        ]
+        cls.authors = [
+            User.objects.create(username=f'author_{i}') for i in range(5)
+        ]
+        cls.reader = User.objects.create(username='reader')
+        for author in cls.authors[:3]:
+            Follow.objects.create(user=cls.reader, author=author)
+        for i in range(60):
+            post = Post.objects.create(
+                text=f'Текст поста №{i}',
+                author=cls.authors[i % 5],
+                group=cls.groups[i % 3],
+            )
+            for _ in range(3):
+                Comment.objects.create(
+                    post=post, author=cls.reader, text='Комментарий'
+                )
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def assert_plans_use_indexes(self, queries):
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            with self.subTest(sql=sql):
+                self.assertEqual(bad_plan_steps(sql), [])
+
+    def test_feed_pages(self):
+        group = self.groups[0]
+        author = self.authors[0]
+        post = self.post
+        cursor = self.client.get(
+            reverse('posts:index') + '?after='
+        ).context['page_obj'].next_cursor
+        follow_cursor = self.client.get(
+            reverse('posts:follow_index') + '?after='
+        ).context['page_obj'].next_cursor
+        api_cursor = self.client.get(
+            reverse('posts:api_follow_index')
+        ).json()['next']
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=3',
+            reverse('posts:index') + '?page=last',
+            reverse('posts:group_list', kwargs={'slug': group.slug})
+            + '?page=last',
+            reverse('posts:index') + f'?after={cursor}',
+            reverse('posts:group_list', kwargs={'slug': group.slug}),
+            reverse('posts:group_list', kwargs={'slug': group.slug})
+            + f'?after={cursor}',
+            reverse('posts:profile', kwargs={'username': author.username}),
+            reverse('posts:profile', kwargs={'username': author.username})
+            + f'?after={cursor}',
+            reverse('posts:follow_index'),
+            reverse('posts:follow_index') + '?page=last',
+            reverse('posts:follow_index') + f'?after={follow_cursor}',
+            reverse('posts:follow_index') + f'?before={follow_cursor}',
+            reverse('posts:post_detail', kwargs={'pk': post.pk}),
+            reverse('posts:comments', kwargs={'pk': post.pk}),
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', kwargs={'slug': group.slug}),
+            reverse('posts:api_profile', kwargs={'username': author.username}),
+            reverse('posts:api_comments', kwargs={'pk': post.pk}),
+            reverse('posts:api_follow_index'),
+            reverse('posts:api_follow_index') + f'?after={api_cursor}',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(self.client.get(url).status_code, 200)
+                self.assert_plans_use_indexes(queries)
+
+    def test_publishing_and_following(self):
+        """Раскладка поста по лентам и подписка тоже идут по индексам."""
+        with CaptureQueriesContext(connection) as queries:
+            Post.objects.create(text='Новый пост', author=self.authors[0])
+            self.client.get(reverse(
+                'posts:profile_follow',
+                kwargs={'username': self.authors[4].username},
+            ))
+        self.assert_plans_use_indexes(queries)
+
+    def test_bad_plan_steps_flag_unbounded_scans(self):
+        steps = bad_plan_steps('SELECT COUNT(*) FROM posts_post')
+        self.assertEqual(len(steps), 1)
+        self.assertIn('USING COVERING INDEX', steps[0])
+        self.assertEqual(bad_plan_steps(
+            'SELECT id FROM posts_post ORDER BY id DESC LIMIT 10'
+        ), [])
+        self.assertEqual(bad_plan_steps(
+            'SELECT COUNT(*) FROM posts_post WHERE author_id = 1'
+        ), [])
@@ -0,0 +1,82 @@
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from posts.models import Post, User
+from posts.search import search_page
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Test_author')
+        cls.relevant = Post.objects.create(
+            text='Котики и ещё раз котики, котики повсюду',
+            author=cls.author,
+        )
+        cls.mentioned = Post.objects.create(
+            text='Сегодня про собак, но немного и про котиков',
+            author=cls.author,
+        )
+        cls.unrelated = Post.objects.create(
+            text='Пост совсем о другом',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def test_search_ranks_and_filters_posts(self):
+        """Поиск находит посты по префиксу слова и ранжирует их."""
+        posts, next_cursor = search_page('котик', 10)
+        self.assertEqual(posts, [self.relevant, self.mentioned])
+        self.assertIsNone(next_cursor)
+
+    def test_search_follows_index_updates(self):
+        """Индекс обновляется при изменении и удалении постов."""
+        post = Post.objects.get(id=self.unrelated.id)
+        post.text = 'Теперь и этот пост про котиков'
+        post.save()
+        self.assertIn(post, search_page('котик', 10)[0])
+        post.delete()
+        self.assertNotIn(post, search_page('котик', 10)[0])
+
+    def test_search_cursor_pages(self):
+        """Страницы выдачи идут по курсору без повторов."""
+        first, next_cursor = search_page('котик', 1)
+        second, last_cursor = search_page('котик', 1, next_cursor)
+        self.assertEqual(first + second, [self.relevant, self.mentioned])
+        self.assertIsNone(last_cursor)
+
+    def test_search_ignores_fts_syntax(self):
+        """Служебные символы запроса не ломают поиск."""
+        response = self.guest.get(
+            reverse('posts:search'), {'q': 'котик" OR NEAR(*'}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты через тот же индекс."""
+        request = RequestFactory().get('/')
+        admin = site._registry[Post]
+        queryset, _ = admin.get_search_results(
+            request, Post.objects.all(), 'собак'
+        )
+        self.assertEqual(list(queryset), [self.mentioned])
+
+    def test_admin_search_without_words(self):
+        """Запрос из одних знаков препинания ничего не находит."""
+        admin = User.objects.create(
+            username='admin', is_staff=True, is_superuser=True
+        )
+        client = Client()
+        client.force_login(admin)
+        for term in ('!!!', '-'):
+            with self.subTest(term=term):
+                response = client.get(
+                    reverse('admin:posts_post_changelist'), {'q': term}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['cl'].result_count, 0)
@@ -0,0 +1,57 @@
+import shutil
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import LiveServerTestCase, TestCase, override_settings
+
+from posts.models import Comment, Follow, Group, Post, Timeline, User
+
+from .fix_data import TEMP_MEDIA_ROOT
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedContentTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_seeds_social_graph(self):
+        call_command(
+            'seed_content', '--users', '30', '--groups', '3',
+            '--posts', '5', '--follows', '4', '--images', '0.5',
+            '--seed', '1', stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertTrue(Comment.objects.exists())
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(Timeline.objects.exists())
+        counts = sorted(
+            User.objects.values_list('stats__posts_count', flat=True)
+        )
+        # у самых активных авторов постов намного больше, чем у типичных
+        self.assertGreater(counts[-1], 2 * counts[len(counts) // 2])
+        self.assertTrue(
+            User.objects.first().check_password('seed-password')
+        )
+
+
+class LoadTestCommandTests(LiveServerTestCase):
+    def test_reports_latency_per_view(self):
+        call_command(
+            'seed_content', '--users', '5', '--images', '0',
+            stdout=StringIO(),
+        )
+        out = StringIO()
+        call_command(
+            'load_test', '--base-url', self.live_server_url,
+            '--clients', '1', '--duration', '1', '--anonymous', '1',
+            '--route', 'posts:index', '--route', 'posts:group_list',
+            stdout=out,
+        )
+        report = out.getvalue()
+        self.assertIn('posts:index', report)
+        self.assertIn('posts:group_list', report)
+        self.assertNotIn('users:login', report)
@@ -0,0 +1,86 @@
+import os
+import shutil
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+
+from posts.models import Post, User
+from posts.thumbnails import POST_IMAGE, generate_thumbnails, thumbnail_urls
+
+from .fix_data import TEMP_MEDIA_ROOT, small_gif
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_generate_thumbnails_creates_files(self):
+        """Миниатюры картинки поста создаются заранее."""
+        post = Post.objects.create(
+            text='Текст поста',
+            author=User.objects.create(username='Test_author'),
+            image=SimpleUploadedFile(
+                name='thumb.gif', content=small_gif, content_type='image/gif'
+            ),
+        )
+        self.assertIsNone(generate_thumbnails(post.image.name))
+        cache_dir = os.path.join(TEMP_MEDIA_ROOT, 'cache')
+        files = [name for _, _, names in os.walk(cache_dir) for name in names]
+        self.assertTrue(files)
+
+    def test_generate_thumbnails_reports_missing_image(self):
+        """Отсутствующая картинка не роняет генерацию, а возвращается."""
+        self.assertEqual(
+            generate_thumbnails('posts/missing.gif'), 'posts/missing.gif'
+        )
+
+    def test_thumbnail_urls_resolved_in_one_batch(self):
+        """URL миниатюр всех картинок страницы находятся одним запросом
+        и совпадают с теми, что выдаёт sorl."""
+        author = User.objects.create(username='Test_author')
+        images = []
+        for i in range(3):
+            post = Post.objects.create(
+                text='Текст поста',
+                author=author,
+                image=SimpleUploadedFile(
+                    name=f'batch_{i}.gif',
+                    content=small_gif,
+                    content_type='image/gif'
+                ),
+            )
+            generate_thumbnails(post.image.name)
+            images.append(post.image.name)
+        cache.clear()
+        with self.assertNumQueries(1):
+            urls = thumbnail_urls(images)
+        geometry, options = POST_IMAGE
+        for image in images:
+            with self.subTest(image=image):
+                self.assertEqual(
+                    urls[image],
+                    get_thumbnail(image, geometry, **options).url
+                )
+
+    def test_thumbnails_generated_after_upload_response(self):
+        """После ответа на загрузку поста миниатюры уже созданы."""
+        client = Client()
+        client.force_login(User.objects.create(username='Test_author'))
+        response = client.post(reverse('posts:post_create'), {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(
+                name='upload.gif', content=small_gif,
+                content_type='image/gif'
+            ),
+        })
+        self.assertEqual(response.status_code, 302)
+        image = Post.objects.get().image.name
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertTrue(thumbnail_urls([image])[image])
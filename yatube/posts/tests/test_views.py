@@ -3,11 +3,22 @@ import time
 
 from django import forms
 from django.core.cache import cache
+from django.core.paginator import Page
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template.loader import render_to_string
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Comment, Follow, Group, Post, User
+from core import after_response
+from posts.feed_counts import scope_count
+from posts.follow_graph import (followees_key, following_among, get_followees,
+                                is_following, pack, version_key)
+from posts.generations import (GLOBAL, author_scope, follower_scope,
+                               group_scope)
+from posts.models import Comment, Follow, Group, Post, Timeline, User
+from posts.paginators import FeedPaginator, pack_cursor
 
 from .fix_data import TEMP_MEDIA_ROOT, small_gif
 
@@ -222,6 +233,8 @@ class PaginatorTests(TestCase):
         ]
 
     def setUp(self):
+        # посты созданы через bulk_create, поколения лент не менялись
+        cache.clear()
         self.guest = Client()
 
     def test_pages_contain_correct_number_of_records(self):
@@ -248,6 +261,332 @@ class PaginatorTests(TestCase):
                 )
 
 
+class FeedCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Test_author')
+        for i in range(12):
+            Post.objects.create(text=f'Текст поста №{i}', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_count_is_cached_until_new_post(self):
+        posts = Post.objects.all()
+        self.assertEqual(scope_count(GLOBAL, posts), (12, True))
+        with self.assertNumQueries(0):
+            self.assertEqual(scope_count(GLOBAL, posts), (12, True))
+        Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(scope_count(GLOBAL, posts), (13, True))
+
+    def test_count_follows_deleted_and_moved_posts(self):
+        """Удаление поста и смена его группы меняют числа постов всех
+        лент, где он был."""
+        group = Group.objects.create(title='Группа', slug='count-group')
+        reader = User.objects.create(username='Test_reader')
+        Follow.objects.create(user=reader, author=self.author)
+        moved, deleted = Post.objects.filter(author=self.author)[:2]
+        moved.group = group
+        moved.save()
+        feeds = {
+            GLOBAL: Post.objects.all(),
+            group_scope(group.slug): Post.objects.filter(group=group),
+            author_scope(self.author.id): Post.objects.filter(
+                author=self.author
+            ),
+            follower_scope(reader.id): Post.objects.filter(
+                timeline__user=reader
+            ),
+        }
+        self.assertEqual(
+            [scope_count(scope, posts)[0] for scope, posts in feeds.items()],
+            [12, 1, 12, 12],
+        )
+        moved.group = None
+        moved.save()
+        deleted.delete()
+        self.assertEqual(
+            [scope_count(scope, posts)[0] for scope, posts in feeds.items()],
+            [11, 0, 11, 11],
+        )
+
+    def test_huge_feed_gets_lower_bound(self):
+        self.assertEqual(
+            scope_count(GLOBAL, Post.objects.all(), limit=5), (5, False)
+        )
+
+    def test_pages_beyond_estimate_are_served(self):
+        paginator = FeedPaginator(Post.objects.all(), 2, 5, exact=False)
+        page = paginator.page(3)
+        self.assertTrue(page.has_next())
+        self.assertFalse(paginator.exact)
+        # за оценкой снизу номер сверяется с точным числом
+        paginator = FeedPaginator(Post.objects.all(), 2, 5, exact=False)
+        page = paginator.page(4)
+        self.assertEqual(len(page), 2)
+        self.assertTrue(page.has_next())
+        self.assertTrue(paginator.exact)
+        self.assertEqual(paginator.count, 12)
+        page = paginator.page(6)
+        self.assertFalse(page.has_next())
+
+    def test_page_numbers_beyond_feed_return_404(self):
+        url = reverse('posts:index')
+        for number in ['7', '99999999999999999999999']:
+            with self.subTest(number=number):
+                response = self.client.get(url, {'page': number})
+                self.assertEqual(response.status_code, 404)
+
+    def test_widget_renders_without_full_count(self):
+        paginator = FeedPaginator(Post.objects.all(), 2, 5, exact=False)
+        page = paginator.page(1)
+        widget = render_to_string(
+            'posts/includes/paginator.html',
+            {'page_obj': page, 'paginator': paginator},
+        )
+        self.assertIn('?page=3', widget)
+        self.assertIn('не меньше 3 стр.', widget)
+        response = self.client.get(reverse('posts:index'))
+        self.assertIs(type(response.context['page_obj']), Page)
+        self.assertContains(response, '?page=2')
+        self.assertNotContains(response, 'не меньше')
+
+
+class ReverseScanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Test_author')
+        for i in range(13):
+            Post.objects.create(text=f'Текст поста №{i}', author=cls.author)
+        cls.ids = list(Post.objects.values_list('id', flat=True))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_near_the_end_match_forward_pages(self):
+        for number in range(1, 8):
+            with self.subTest(number=number):
+                paginator = FeedPaginator(Post.objects.all(), 2, 13)
+                page = paginator.page(number)
+                self.assertEqual(
+                    [post.id for post in page],
+                    self.ids[(number - 1) * 2:number * 2],
+                )
+                self.assertEqual(page.has_next(), number < 7)
+
+    def test_stale_count_does_not_repeat_posts(self):
+        """Устаревшее число постов (пост удалён в обход кэша) сверяется
+        перед чтением с конца, и посты не повторяются."""
+        for count in (12, 14):
+            with self.subTest(count=count):
+                seen = []
+                for number in range(1, 8):
+                    paginator = FeedPaginator(Post.objects.all(), 2, count)
+                    seen.extend(post.id for post in paginator.page(number))
+                self.assertEqual(seen, self.ids)
+
+    def test_last_page_is_read_from_the_end(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index') + '?page=last')
+        page = response.context['page_obj']
+        self.assertEqual(page.number, 2)
+        self.assertEqual([post.id for post in page], self.ids[10:])
+        feed = [
+            query['sql'] for query in queries
+            if 'FROM "posts_post"' in query['sql'] and 'LIMIT' in query['sql']
+            and 'COUNT' not in query['sql']
+        ]
+        self.assertEqual(len(feed), 1)
+        self.assertIn('ASC', feed[0])
+        self.assertNotIn('OFFSET', feed[0])
+
+    def test_last_page_of_estimated_feed_is_counted_once(self):
+        paginator = FeedPaginator(
+            Post.objects.all(), 2, 4, exact=False,
+            recount=lambda: scope_count(GLOBAL, Post.objects.all(), None)[0],
+        )
+        page = paginator.page('last')
+        self.assertEqual(page.number, 7)
+        self.assertEqual([post.id for post in page], self.ids[12:])
+        self.assertEqual(scope_count(GLOBAL, Post.objects.all()), (13, True))
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Test_author')
+        cls.posts_qty = 25
+        Post.objects.bulk_create(Post(
+            text=f'Текст поста №{i}',
+            author=cls.author,
+        ) for i in range(cls.posts_qty))
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def test_cursor_pages_cover_feed_without_gaps(self):
+        """Переход по токенам ?after= проходит всю ленту без пропусков
+        и повторов."""
+        url = reverse('posts:index')
+        response = self.guest.get(url + '?after=')
+        page_obj = response.context['page_obj']
+        seen = list(page_obj)
+        while page_obj.has_next():
+            response = self.guest.get(
+                url + f'?after={page_obj.next_cursor}'
+            )
+            page_obj = response.context['page_obj']
+            seen.extend(page_obj)
+        self.assertEqual(
+            [post.id for post in seen],
+            list(Post.objects.order_by('-pub_date', '-id')
+                 .values_list('id', flat=True))
+        )
+
+    def test_follow_feed_cursor_follows_timeline(self):
+        """Лента подписок листается по ключу строки ленты, в том числе
+        при одинаковых датах, и на сайте, и в API."""
+        reader = User.objects.create(username='Test_reader')
+        Follow.objects.create(user=reader, author=self.author)
+        Timeline.objects.filter(user=reader).update(
+            pub_date=Post.objects.earliest('pub_date').pub_date
+        )
+        expected = list(Timeline.objects.filter(user=reader).order_by(
+            '-pub_date', '-post_id'
+        ).values_list('post_id', flat=True))
+        client = Client()
+        client.force_login(reader)
+        url = reverse('posts:follow_index')
+        page_obj = client.get(url + '?after=').context['page_obj']
+        seen = [post.id for post in page_obj]
+        while page_obj.has_next():
+            page_obj = client.get(
+                url + f'?after={page_obj.next_cursor}'
+            ).context['page_obj']
+            seen.extend(post.id for post in page_obj)
+        self.assertEqual(seen, expected)
+        url = reverse('posts:api_follow_index')
+        data = client.get(url).json()
+        seen = [item['id'] for item in data['results']]
+        while data['next']:
+            data = client.get(url, {'after': data['next']}).json()
+            seen.extend(item['id'] for item in data['results'])
+        self.assertEqual(seen, expected)
+
+    def test_before_cursor_returns_previous_page(self):
+        """Токен ?before= возвращает ту же страницу, с которой ушли."""
+        url = reverse('posts:index')
+        first = self.guest.get(url + '?after=').context['page_obj']
+        second = self.guest.get(
+            url + f'?after={first.next_cursor}'
+        ).context['page_obj']
+        back = self.guest.get(
+            url + f'?before={second.previous_cursor}'
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_invalid_cursor_returns_404(self):
+        """Испорченный токен курсора или значения вне диапазона дают 404."""
+        post = Post.objects.first()
+        tokens = [
+            '@@@',
+            pack_cursor(10 ** 21, 1),
+            pack_cursor(0, 10 ** 21),
+        ]
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:comments', kwargs={'pk': post.pk}),
+        ]
+        for url in urls:
+            for token in tokens:
+                with self.subTest(url=url, token=token):
+                    response = self.guest.get(url, {'after': token})
+                    self.assertEqual(response.status_code, 404)
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Test_author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            description='Описание тестовой группы',
+            slug='test-slug',
+        )
+        cls.post = Post.objects.create(
+            text='Текст поста для теста',
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def test_card_is_cached_between_requests(self):
+        """Отрисованная карточка берётся из кэша при повторном запросе."""
+        url = reverse('posts:profile', kwargs={'username': 'Test_author'})
+        self.guest.get(url)
+        # меняем текст в обход сигналов, карточка должна остаться прежней
+        Post.objects.filter(id=self.post.id).update(text='Новый текст')
+        response = self.guest.get(url)
+        self.assertContains(response, 'Текст поста для теста')
+
+    def test_card_invalidated_on_post_and_group_save(self):
+        """Сохранение поста или группы сбрасывает карточку."""
+        url = reverse('posts:profile', kwargs={'username': 'Test_author'})
+        self.guest.get(url)
+        post = Post.objects.get(id=self.post.id)
+        post.text = 'Отредактированный текст'
+        post.save()
+        self.assertContains(self.guest.get(url), 'Отредактированный текст')
+        self.group.slug = 'new-slug'
+        self.group.save()
+        self.assertContains(self.guest.get(url), '/group/new-slug/')
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Test_author')
+        cls.post = Post.objects.create(text='Текст поста', author=cls.author)
+        cls.comments_qty = 25
+        Comment.objects.bulk_create(Comment(
+            post=cls.post,
+            author=cls.author,
+            text=f'Комментарий №{i}',
+        ) for i in range(cls.comments_qty))
+
+    def setUp(self):
+        self.guest = Client()
+
+    def test_post_detail_shows_first_comments_page(self):
+        """На странице поста выводится только первая страница
+        комментариев и ссылка на следующую."""
+        response = self.guest.get(
+            reverse('posts:post_detail', kwargs={'pk': self.post.pk})
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, comments.next_cursor)
+
+    def test_comments_fragment_returns_older_comments(self):
+        """Фрагмент комментариев отдаёт оставшиеся комментарии."""
+        first = self.guest.get(
+            reverse('posts:post_detail', kwargs={'pk': self.post.pk})
+        ).context['comments']
+        response = self.guest.get(
+            reverse('posts:comments', kwargs={'pk': self.post.pk})
+            + f'?after={first.next_cursor}'
+        )
+        rest = response.context['comments']
+        self.assertEqual(len(rest), self.comments_qty - 20)
+        self.assertFalse(rest.has_next())
+        self.assertFalse(set(first) & set(rest))
+
+
 class FollowTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -333,3 +672,287 @@ class FollowTest(TestCase):
         # проверяем, что у него нет постов от авторов,
         # на которых он не подписывался
         self.assertFalse(post in response.context['page_obj'])
+
+    def test_timeline_backfilled_on_follow_and_pruned_on_unfollow(self):
+        """При подписке старые посты автора попадают в ленту подписчика,
+        при отписке — удаляются из неё."""
+        post = Post.objects.create(
+            text='Текст тестового поста',
+            author=self.author
+        )
+        self.authorized_follower.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertTrue(
+            Timeline.objects.filter(user=self.follower, post=post).exists()
+        )
+        self.authorized_follower.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertFalse(
+            Timeline.objects.filter(user=self.follower).exists()
+        )
+
+    def test_fan_out_runs_after_response(self):
+        """Пост попадает в ленты подписчиков после ответа на запрос,
+        а удалённый до этого пост не раскладывается."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        after_response.start_queue()
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        deleted = Post.objects.create(text='Удалён', author=self.author)
+        deleted.delete()
+        self.assertFalse(Timeline.objects.filter(user=self.follower))
+        after_response.run_queue()
+        self.assertEqual(
+            list(Timeline.objects.filter(
+                user=self.follower
+            ).values_list('post_id', flat=True)),
+            [post.id],
+        )
+
+    def test_follow_and_unfollow_are_idempotent(self):
+        """Повторная подписка не создаёт дубль, отписка без подписки
+        не приводит к ошибке."""
+        follow_url = reverse(
+            'posts:profile_follow', kwargs={'username': self.author.username}
+        )
+        unfollow_url = reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        )
+        for url, count in [
+            (unfollow_url, 0),
+            (follow_url, 1),
+            (follow_url, 1),
+            (unfollow_url, 0),
+            (unfollow_url, 0),
+        ]:
+            with self.subTest(url=url, count=count):
+                response = self.authorized_follower.get(url)
+                self.assertEqual(response.status_code, 302)
+                self.assertEqual(Follow.objects.count(), count)
+                self.author.stats.refresh_from_db()
+                self.assertEqual(self.author.stats.followers_count, count)
+
+    def test_follow_graph_rebuilt_after_follow(self):
+        """Массив подписок строится одним запросом, подписка и отписка
+        делают его устаревшим, а проверки страницы идут без базы."""
+        Follow.objects.create(user=self.follower, author=self.user_2)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(
+                list(get_followees(self.follower.id)), [self.user_2.id]
+            )
+        self.assertEqual(len(queries), 1)
+        version = cache.get(version_key(self.follower.id))
+        Follow.objects.create(user=self.follower, author=self.author)
+        # массив, построенный другим процессом до подписки, но записанный
+        # в кэш после неё, не принимается
+        cache.set(
+            followees_key(self.follower.id), (version, pack([self.user_2.id]))
+        )
+        self.assertEqual(
+            list(get_followees(self.follower.id)),
+            sorted([self.author.id, self.user_2.id]),
+        )
+        profile_url = reverse(
+            'posts:profile', kwargs={'username': self.author.username}
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(
+                following_among(
+                    self.follower.id, [self.author.id, self.follower.id]
+                ),
+                {self.author.id},
+            )
+        self.assertEqual(len(queries), 0)
+        response = self.authorized_follower.get(profile_url)
+        self.assertTrue(response.context['following'])
+        self.authorized_follower.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        self.assertFalse(is_following(self.follower.id, self.author.id))
+        self.assertTrue(is_following(self.follower.id, self.user_2.id))
+        response = self.authorized_follower.get(profile_url)
+        self.assertFalse(response.context['following'])
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Test_author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            description='Описание тестовой группы',
+            slug='test-slug',
+        )
+        cls.post = Post.objects.create(
+            text='Текст тестового поста',
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def revalidate(self, url):
+        response = self.guest.get(url)
+        self.assertEqual(response.status_code, 200)
+        return self.guest.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_are_not_modified(self):
+        """Повторный запрос с ETag получает 304 без выборки ленты."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse(
+                'posts:profile', kwargs={'username': self.author.username}
+            ),
+            reverse('posts:post_detail', kwargs={'pk': self.post.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.revalidate(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertIsNone(response.context)
+
+    def test_changes_in_scope_invalidate_validators(self):
+        index = reverse('posts:index')
+        detail = reverse('posts:post_detail', kwargs={'pk': self.post.pk})
+        etag = self.guest.get(index)['ETag']
+        Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(
+            self.guest.get(index, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+        etag = self.guest.get(detail)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий'
+        )
+        self.assertEqual(
+            self.guest.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_feed_validators_do_not_read_the_feed(self):
+        """ETag ленты строится из поколений в кэше: 304 не требует
+        ни одного SQL-запроса."""
+        url = reverse('posts:index')
+        etag = self.guest.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.get(id=self.post.id).delete()
+        self.assertEqual(
+            self.guest.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_new_login_changes_validators(self):
+        """После повторного входа меняется CSRF-токен, и страница
+        с формой не отдаётся из кэша браузера со старым токеном."""
+        client = Client(enforce_csrf_checks=True)
+        url = reverse('posts:post_detail', kwargs={'pk': self.post.pk})
+        client.force_login(self.author)
+        client.get(url)
+        etag = client.get(url)['ETag']
+        client.logout()
+        client.force_login(self.author)
+        client.get(reverse('posts:index'))
+        self.assertEqual(
+            client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_changes_out_of_scope_keep_validators(self):
+        group = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        etag = self.guest.get(group)['ETag']
+        Post.objects.create(text='Пост без группы', author=self.author)
+        self.assertEqual(
+            self.guest.get(group, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+    def test_group_edit_changes_validators(self):
+        url = reverse('posts:index')
+        etag = self.guest.get(url)['ETag']
+        group = Group.objects.get(id=self.group.id)
+        group.slug = 'new-slug'
+        group.save()
+        self.assertEqual(
+            self.guest.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+
+class FeedCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Test_author')
+        cls.other_author = User.objects.create(username='Other_author')
+        cls.follower = User.objects.create(username='Test_follower')
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            description='Описание тестовой группы',
+            slug='test-slug',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            description='Описание другой группы',
+            slug='other-slug',
+        )
+        Post.objects.create(
+            text='Первый пост', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.follower)
+
+    def is_cached(self, url):
+        """Была ли лента взята из кэша: из кэша не выбирается страница."""
+        return self.client.get(url).context['page_obj'] is None
+
+    def test_feed_is_cached_between_requests(self):
+        url = reverse('posts:index')
+        self.assertFalse(self.is_cached(url))
+        self.assertTrue(self.is_cached(url))
+
+    def test_new_post_bumps_only_its_scopes(self):
+        """Новый пост сбрасывает только ленты, в которые он попадает."""
+        urls = {
+            'index': reverse('posts:index'),
+            'group': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ),
+            'other_group': reverse(
+                'posts:group_list', kwargs={'slug': self.other_group.slug}
+            ),
+            'author': reverse(
+                'posts:profile', kwargs={'username': self.author.username}
+            ),
+            'other_author': reverse(
+                'posts:profile',
+                kwargs={'username': self.other_author.username},
+            ),
+            'follow': reverse('posts:follow_index'),
+        }
+        for url in urls.values():
+            self.client.get(url)
+        Post.objects.create(
+            text='Новый пост', author=self.author, group=self.group
+        )
+        bumped = {'index', 'group', 'author', 'follow'}
+        for name, url in urls.items():
+            with self.subTest(feed=name):
+                self.assertEqual(self.is_cached(url), name not in bumped)
+        response = self.client.get(urls['group'])
+        self.assertContains(response, 'Новый пост')
+
+    def test_follow_bumps_follower_feed(self):
+        url = reverse('posts:follow_index')
+        self.client.get(url)
+        self.client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.other_author.username}
+        ))
+        self.assertFalse(self.is_cached(url))
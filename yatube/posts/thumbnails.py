@@ -0,0 +1,115 @@
+import logging
+
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from core.after_response import defer
+from yatube.settings import THUMBNAIL_PREGENERATE
+
+logger = logging.getLogger(__name__)
+
+# миниатюры, которые выводят шаблоны постов: (геометрия, опции тега)
+POST_THUMBNAILS = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+# миниатюра в карточке и на странице поста
+POST_IMAGE = POST_THUMBNAILS[0]
+
+
+def generate_thumbnails(image_name):
+    """Создаёт все миниатюры изображения поста.
+
+    Возвращает имя изображения, если хотя бы одну миниатюру
+    построить не удалось.
+    """
+    failed = None
+    for geometry, options in POST_THUMBNAILS:
+        try:
+            # sorl сам глотает ошибки чтения исходника и возвращает
+            # несуществующий файл, поэтому проверяем результат
+            if get_thumbnail(image_name, geometry, **options).exists():
+                continue
+        except Exception:
+            logger.exception('Не удалось создать миниатюру %s', image_name)
+        failed = image_name
+    return failed
+
+
+def thumbnail_name(image_name, geometry, options):
+    """Имя файла миниатюры, которое выберет sorl для этих опций.
+
+    Повторяет вычисление имени из Backend.get_thumbnail.
+    """
+    backend = default.backend
+    source = ImageFile(image_name)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, geometry, options)
+
+
+def thumbnail_urls(image_names, geometry=POST_IMAGE[0],
+                   options=POST_IMAGE[1]):
+    """URL миниатюр для набора картинок одним обращением к хранилищу.
+
+    Наличие миниатюр проверяется одним cache.get_many по ключам
+    хранилища sorl и одним запросом к его таблице для промахов кэша;
+    поштучно через get_thumbnail создаются только отсутствующие.
+    """
+    names = {
+        image: thumbnail_name(image, geometry, options)
+        for image in set(image_names) if image
+    }
+    keys = {
+        add_prefix(ImageFile(name, default.storage).key): image
+        for image, name in names.items()
+    }
+    kv_cache = default.kvstore.cache
+    found = {
+        key for key, value in kv_cache.get_many(list(keys)).items()
+        # sorl кэширует и отсутствие записи — это не строка
+        if isinstance(value, str)
+    }
+    missing = [key for key in keys if key not in found]
+    if missing:
+        stored = dict(
+            KVStore.objects.filter(key__in=missing).values_list('key', 'value')
+        )
+        kv_cache.set_many(stored, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(stored)
+    urls = {}
+    for key, image in keys.items():
+        if key in found:
+            urls[image] = default.storage.url(names[image])
+        else:
+            thumbnail = get_thumbnail(image, geometry, **options)
+            urls[image] = thumbnail.url if thumbnail.exists() else None
+    return urls
+
+
+def resolve_thumbnails(posts):
+    """Проставляет постам thumbnail_url для вывода в шаблонах."""
+    urls = thumbnail_urls(post.image.name for post in posts)
+    for post in posts:
+        post.thumbnail_url = urls.get(post.image.name)
+    return posts
+
+
+def schedule_thumbnails(response, image_name):
+    """Создаёт миниатюры картинки после отправки ответа.
+
+    Первому зрителю поста не приходится ждать Pillow внутри запроса.
+    """
+    if image_name and THUMBNAIL_PREGENERATE:
+        defer(generate_thumbnails, image_name)
+    return response
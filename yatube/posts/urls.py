@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
@@ -9,6 +9,12 @@ urlpatterns = [
     path('group/<slug:slug>/', views.GroupView.as_view(), name='group_list'),
     path('profile/<str:username>/', views.ProfileView.as_view(), name='profile'),
     path('posts/<int:pk>/', views.PostDetalView.as_view(), name='post_detail'),
+    path(
+        'posts/<int:pk>/comments/',
+        views.CommentListView.as_view(),
+        name='comments',
+    ),
+    path('search/', views.SearchView.as_view(), name='search'),
     path('create/', views.PostCreateView.as_view(), name='post_create'),
     path('posts/<int:pk>/edit/', views.PostEditView.as_view(), name='post_edit'),
     path(
@@ -27,4 +33,37 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path('export/', views.export_content, name='export'),
+    path('api/posts/', api.ApiIndexView.as_view(), name='api_index'),
+    path(
+        'api/group/<slug:slug>/',
+        api.ApiGroupView.as_view(),
+        name='api_group_list',
+    ),
+    path(
+        'api/profile/<str:username>/',
+        api.ApiProfileView.as_view(),
+        name='api_profile',
+    ),
+    path(
+        'api/profile/<str:username>/follow/',
+        api.ApiFollowAuthorView.as_view(),
+        name='api_profile_follow',
+    ),
+    path('api/follow/', api.ApiFollowView.as_view(), name='api_follow_index'),
+    path(
+        'api/follow/bulk/',
+        api.ApiFollowBulkView.as_view(),
+        name='api_follow_bulk',
+    ),
+    path(
+        'api/posts/<int:pk>/',
+        api.ApiPostDetailView.as_view(),
+        name='api_post_detail',
+    ),
+    path(
+        'api/posts/<int:pk>/comments/',
+        api.ApiCommentsView.as_view(),
+        name='api_comments',
+    ),
 ]
@@ -1,33 +1,177 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseRedirect
-from django.views.generic import CreateView, DetailView, ListView, UpdateView
+from django.core.cache import cache
+from django.core.paginator import InvalidPage
+from django.db.models import OuterRef, Subquery
+from django.http import (Http404, HttpResponseBadRequest,
+                         HttpResponseRedirect, StreamingHttpResponse)
+from django.views.generic import (CreateView, DetailView, ListView,
+                                  TemplateView, UpdateView)
 from django.views.generic.edit import FormMixin
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import get_object_or_404, redirect
+from django.template.loader import render_to_string
 from django.urls import reverse 
+from django.utils.safestring import mark_safe
+
+from core.query_budget import query_budget
+from yatube.settings import (COMMENTS_ON_PAGE, FEED_CACHE_TIMEOUT,
+                             POSTS_CURSOR_PAGINATION, POSTS_ON_PAGE)
+
+from .cards import render_cards
+from .conditional import ConditionalMixin, feed_state
+from .exporter import (EXPORT_TYPES, InvalidWatermark, export_lines,
+                       gzip_stream, parse_watermark)
+from .feed_counts import scope_count
+from .follow_graph import is_following
+from .follows import follow, timeline_of, unfollow
+from .forms import CommentForm, PostForm
+from .generations import (GLOBAL, author_scope, feed_cache_key,
+                          follower_scope, group_scope)
+from .models import Comment, Group, Post, User
+from .paginators import CursorPaginator, FeedPaginator, InvalidCursor
+from .search import search_page
+from .thumbnails import resolve_thumbnails, schedule_thumbnails
 
-from yatube.settings import POSTS_ON_PAGE
 
-from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
+def comments_page(post_id, after=None):
+    """Страница комментариев поста, от новых к старым."""
+    comments = Comment.objects.filter(post_id=post_id).select_related('author')
+    paginator = CursorPaginator(comments, COMMENTS_ON_PAGE, field='created')
+    try:
+        return paginator.cursor_page(after=after)
+    except InvalidCursor as e:
+        raise Http404(str(e))
+
+
+PAGINATOR_TEMPLATE = 'posts/includes/paginator.html'
 
 
-class PostList(ListView):
+class PostList(ConditionalMixin, ListView):
+    model = Post
     paginate_by = POSTS_ON_PAGE
+    # режим курсора включается для представления целиком
+    # или запросом с токеном ?after=/?before=
+    cursor_pagination = POSTS_CURSOR_PAGINATION
+    # ключ курсора: дата и поле, которое её добивает
+    cursor_field = 'pub_date'
+    cursor_tiebreak = 'id'
+    # выводить ли автора в карточке поста
+    card_show_author = True
+    cached_feed = None
+
+    def uses_cursor(self):
+        params = self.request.GET
+        return (
+            self.cursor_pagination
+            or 'after' in params
+            or 'before' in params
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.uses_cursor():
+            return self.paginate_by_number(queryset, page_size)
+        paginator = CursorPaginator(
+            queryset, page_size,
+            field=self.cursor_field, tiebreak=self.cursor_tiebreak,
+        )
+        try:
+            page = paginator.cursor_page(
+                after=self.request.GET.get('after') or None,
+                before=self.request.GET.get('before') or None,
+            )
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def paginate_by_number(self, queryset, page_size):
+        # page=last и страницы у конца ленты FeedPaginator читает
+        # с конца, поэтому номер передаётся ему как есть
+        paginator = self.get_paginator(
+            queryset, page_size,
+            orphans=self.get_paginate_orphans(),
+            allow_empty_first_page=self.get_allow_empty(),
+        )
+        number = (
+            self.kwargs.get(self.page_kwarg)
+            or self.request.GET.get(self.page_kwarg)
+            or 1
+        )
+        try:
+            page = paginator.page(number)
+        except InvalidPage as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        count, exact = self.get_feed_count(queryset)
+        scope = self.get_feed_scope()
+        return FeedPaginator(
+            queryset, per_page, count, exact,
+            recount=lambda: scope_count(scope, queryset, limit=None)[0],
+            **kwargs,
+        )
+
+    def get_feed_count(self, queryset):
+        """Число постов ленты и признак точности без полного COUNT(*)."""
+        return scope_count(self.get_feed_scope(), queryset)
+
+    def get_queryset(self):
+        # автор и группа выводятся в каждой карточке поста
+        return super().get_queryset().select_related('author', 'group')
+
+    def get_validators(self):
+        scope = self.get_feed_scope()
+        return scope and (feed_state(scope), None)
+
+    def get_feed_scope(self):
+        """Область ленты для кэша страниц и ETag; None отключает их."""
+        return None
+
+    def get_paginate_by(self, queryset):
+        # для ленты из кэша страницу выбирать не нужно
+        if self.cached_feed is not None:
+            return None
+        return super().get_paginate_by(queryset)
+
+    def get_context_data(self, **kwargs):
+        scope = self.get_feed_scope()
+        key = scope and feed_cache_key(scope, self.request.GET.urlencode())
+        self.cached_feed = key and cache.get(key)
+        context = super().get_context_data(**kwargs)
+        if self.cached_feed is not None:
+            cards, pagination = self.cached_feed
+        else:
+            cards = render_cards(
+                context['object_list'], self.card_show_author
+            )
+            pagination = render_to_string(PAGINATOR_TEMPLATE, context)
+            if key:
+                cache.set(key, (cards, pagination), FEED_CACHE_TIMEOUT)
+        context['post_cards'] = [mark_safe(card) for card in cards]
+        context['pagination'] = mark_safe(pagination)
+        return context
 
 
 class IndexView(PostList):
-    model = Post
     template_name = 'posts/index.html'
+    query_budget = 5
+
+    def get_feed_scope(self):
+        return GLOBAL
 
 
 class GroupView(PostList):
     template_name = 'posts/group_list.html'
+    query_budget = 6
 
     def get_queryset(self):
-        posts = Post.objects.filter(group__slug=self.kwargs['slug'])
+        posts = super().get_queryset().filter(group__slug=self.kwargs['slug'])
         return posts
 
+    def get_feed_scope(self):
+        return group_scope(self.kwargs['slug'])
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['group'] = get_object_or_404(Group, slug=self.kwargs['slug'])
@@ -36,37 +180,127 @@ class GroupView(PostList):
 
 class ProfileView(PostList):
     template_name = 'posts/profile.html'
+    query_budget = 6
+    card_show_author = False
+
+    def get(self, request, *args, **kwargs):
+        self.author = get_object_or_404(
+            User.objects.select_related('stats'), username=kwargs['username']
+        )
+        return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        posts = Post.objects.filter(author__username=self.kwargs['username'])
+        posts = super().get_queryset().filter(author=self.author)
         return posts
 
+    def get_feed_scope(self):
+        return author_scope(self.author.id)
+
+    def get_feed_count(self, queryset):
+        stats = getattr(self.author, 'stats', None)
+        if stats is None:
+            return super().get_feed_count(queryset)
+        return stats.posts_count, True
+
+    def get_validators(self):
+        state, modified = super().get_validators()
+        user = self.request.user
+        self.following = (
+            user.is_authenticated
+            and is_following(user.id, self.author.id)
+        )
+        stats = getattr(self.author, 'stats', None)
+        counts = stats and (stats.followers_count, stats.following_count)
+        return (state, counts, self.following), modified
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['author'] = User.objects.get(username=self.kwargs['username'])
-        following = self.request.user.is_authenticated
-        if following:
-            following = context['author'].following.filter(user=self.request.user).exists()
-        context['following'] = following
+        context['author'] = self.author
+        context['following'] = self.following
         return context
 
 
-class PostDetalView(FormMixin, DetailView):
+class PostDetalView(ConditionalMixin, FormMixin, DetailView):
     model = Post
     form_class = CommentForm
     template_name = 'posts/post_detail.html'
+    query_budget = 6
+
+    def get_queryset(self):
+        return super().get_queryset().select_related(
+            'author__stats', 'group'
+        )
+
+    def get_validators(self):
+        # последний комментарий подзапросом по индексу (post, -created)
+        last_comment = Comment.objects.filter(
+            post=OuterRef('pk')
+        ).order_by('-created').values('created')[:1]
+        state = Post.objects.filter(pk=self.kwargs['pk']).annotate(
+            last_comment=Subquery(last_comment)
+        ).values(
+            'updated', 'comments_count', 'author__stats__posts_count',
+            'last_comment',
+        ).first()
+        if state is None:
+            raise Http404('Пост не найден')
+        modified = max(filter(None, (state['updated'], state['last_comment'])))
+        return state, modified
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['comments'] = comments_page(self.object.id)
+        resolve_thumbnails([self.object])
+        return context
+
+
+class CommentListView(TemplateView):
+    """Фрагмент со следующей страницей комментариев поста."""
+    template_name = 'posts/includes/comment_list.html'
+    query_budget = 3
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['post_id'] = self.kwargs['pk']
+        context['comments'] = comments_page(
+            self.kwargs['pk'], self.request.GET.get('after') or None
+        )
+        return context
+
+
+class SearchView(TemplateView):
+    template_name = 'posts/search.html'
+    query_budget = 5
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        after = self.request.GET.get('after') or None
+        try:
+            posts, next_cursor = search_page(query, POSTS_ON_PAGE, after)
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        context['query'] = query
+        context['post_cards'] = render_cards(posts)
+        context['next_cursor'] = next_cursor
+        context['is_first_page'] = after is None
+        return context
 
 
 class PostCreateView(LoginRequiredMixin, CreateView):
     model = Post
     template_name = 'posts/create_post.html'
     form_class = PostForm
+    query_budget = 3
 
     def form_valid(self, form):
         self.object = form.save(commit=False)
         self.object.author = self.request.user
         self.object.save()
-        return HttpResponseRedirect(self.get_success_url())
+        return schedule_thumbnails(
+            HttpResponseRedirect(self.get_success_url()),
+            self.object.image.name,
+        )
 
     def get_success_url(self):
         return reverse('posts:profile', kwargs={'username': self.request.user})
@@ -77,12 +311,19 @@ class PostEditView(LoginRequiredMixin, UpdateView):
     form_class = PostForm
     template_name = 'posts/create_post.html'
     extra_context = {'is_edit': True}
+    query_budget = 4
 
     def get(self, request, *args, **kwargs):
         self.object = self.get_object()
-        if self.object.author != self.request.user:
+        if self.object.author_id != self.request.user.id:
             return HttpResponseRedirect(self.get_success_url())
-        return super().get(request, *args, **kwargs)
+        return self.render_to_response(self.get_context_data())
+
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        if 'image' in form.changed_data:
+            schedule_thumbnails(response, self.object.image.name)
+        return response
 
 
 class AddCommentView(LoginRequiredMixin, CreateView):
@@ -104,34 +345,58 @@ class AddCommentView(LoginRequiredMixin, CreateView):
 class FollowIndexView(LoginRequiredMixin, PostList):
     template_name = 'posts/follow.html'
     extra_context = {'follow': True}
+    query_budget = 5
+    cursor_field = 'feed_date'
+    cursor_tiebreak = 'feed_post'
 
     def get_queryset(self):
-        posts_list = Post.objects.filter(author__following__user=self.request.user)
-        return posts_list
+        return timeline_of(super().get_queryset(), self.request.user).order_by(
+            '-feed_date', '-feed_post'
+        )
+
+    def get_feed_scope(self):
+        return follower_scope(self.request.user.id)
 
 
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    user = request.user
-    if not Follow.objects.filter(
-        author=author,
-        user=user
-    ).exists() and user != author:
-        new_follow = Follow(author=author, user=user)
-        new_follow.save()
-        return redirect('posts:profile', username=username)
+    follow(request.user.id, [author.id])
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    user = request.user
-    follow = Follow.objects.get(
-        author=author,
-        user=user
-    )
-    if follow:
-        follow.delete()
-        return redirect('posts:profile', username=username)
+    unfollow(request.user.id, [author.id])
+    return redirect('posts:profile', username=username)
+
+
+@query_budget(5)
+@staff_member_required
+def export_content(request):
+    """Потоковая выгрузка NDJSON для администраторов.
+
+    ?type= выбирает типы записей, ?since= — дату, после которой
+    выгружать посты и комментарии, ?gzip=1 сжимает ответ.
+    """
+    kinds = request.GET.getlist('type') or EXPORT_TYPES
+    if not set(kinds) <= set(EXPORT_TYPES):
+        return HttpResponseBadRequest('Неизвестный тип записей')
+    try:
+        since = parse_watermark(request.GET.get('since'))
+    except InvalidWatermark as e:
+        return HttpResponseBadRequest(str(e))
+    lines = export_lines(kinds, since)
+    filename = 'export.ndjson'
+    if request.GET.get('gzip'):
+        response = StreamingHttpResponse(
+            gzip_stream(lines), content_type='application/gzip'
+        )
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(
+            lines, content_type='application/x-ndjson; charset=utf-8'
+        )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
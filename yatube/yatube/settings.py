@@ -1,4 +1,8 @@
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -37,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,6 +50,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.query_budget.QueryBudgetMiddleware',
+    'core.db_router.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -54,8 +61,16 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # шаблоны компилируются один раз на процесс и прогреваются
+            # при старте (core.template_warmup); после правки шаблона
+            # сервер нужно перезапустить
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -67,14 +82,40 @@ TEMPLATES = [
     },
 ]
 
+# шаблоны приложений загружает app_directories.Loader внутри cached.Loader,
+# а debug_toolbar проверяет только APP_DIRS
+SILENCED_SYSTEM_CHECKS = ['debug_toolbar.W006']
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # подключение живёт между запросами, а не открывается на каждый
+        'CONN_MAX_AGE': 600,
     }
 }
+# PRAGMA для каждого нового подключения к SQLite (core.sqlite):
+# WAL не блокирует чтение записью, NORMAL синхронизирует диск только
+# на контрольных точках WAL, busy_timeout ждёт блокировку вместо
+# ошибки "database is locked"; пустой словарь — настройки SQLite
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 10000,
+    'mmap_size': 256 * 1024 * 1024,
+    # отрицательное значение — размер в КиБ
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+# чтение posts и auth с реплик: псевдонимы из DATABASES, например
+# DATABASES['replica'] = {..., 'TEST': {'MIRROR': 'default'}} и
+# DATABASE_REPLICAS = ['replica']; пустой список — всё из основной базы
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+DATABASE_REPLICAS = []
+# сколько секунд после записи клиент читает из основной базы
+REPLICA_PIN_SECONDS = 5
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -123,16 +164,72 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 # количество выводимых записей для пагинатора
 POSTS_ON_PAGE = 10
+# количество комментариев, подгружаемых за раз
+COMMENTS_ON_PAGE = 20
+# число постов ленты для пагинатора считается не дальше этой границы:
+# у больших лент виджет показывает «не меньше N страниц»
+FEED_COUNT_LIMIT = 1000
+# время жизни числа постов ленты в кэше; новые посты сбрасывают его
+# сменой поколения
+FEED_COUNT_TIMEOUT = 60 * 10
+# пагинация лент по курсору (pub_date, id) вместо номера страницы
+POSTS_CURSOR_PAGINATION = False
+# размер пачки при раскладке постов по лентам подписчиков
+TIMELINE_BATCH_SIZE = 500
+# время жизни массива подписок пользователя в кэше (posts.follow_graph);
+# подписки и отписки сбрасывают его сменой поколения
+FOLLOW_GRAPH_TIMEOUT = 60 * 60 * 24
+# сколько авторов можно передать в api/follow/bulk/ за один запрос
+FOLLOW_BULK_LIMIT = 50
+# время жизни закэшированной HTML-карточки поста, в секундах
+POST_CARD_TIMEOUT = 60 * 60 * 24
+# страницы лент хранятся недолго: новые посты и правки сбрасывают их
+# сменой поколения, удалённые посты исчезают по таймауту
+FEED_CACHE_TIMEOUT = 20
+# создавать миниатюры загруженных картинок сразу после ответа на запрос
+THUMBNAIL_PREGENERATE = True
+# проверка бюджета SQL-запросов view: None, 'log' или 'raise'
+QUERY_BUDGET_MODE = None
+# компилировать все шаблоны при старте WSGI-процесса
+TEMPLATE_WARM_UP = True
+# метрики запросов по view (core.metrics): процессы сбрасывают их
+# в общий кэш не чаще раза в METRICS_FLUSH_INTERVAL секунд
+METRICS_ENABLED = True
+METRICS_FLUSH_INTERVAL = 5
+# снимок процесса, не писавшего метрики дольше этого, выпадает из суммы,
+# а его слот в кэше освобождается; живой процесс продлевает слот
+# из фонового потока, даже если не получает запросов
+METRICS_SLOT_TTL = 60
+# /metrics/ доступен адресам из METRICS_ALLOWED_IPS по REMOTE_ADDR.
+# За обратным прокси REMOTE_ADDR — адрес прокси, и при 127.0.0.1 в списке
+# метрики видны всем: там задайте METRICS_TOKEN, тогда доступ только
+# с заголовком Authorization: Bearer <токен>, а список адресов
+# не проверяется
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+METRICS_TOKEN = None
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# кэш в файле SQLite общий для всех процессов сервера
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_SIZE': 64 * 1024 * 1024,
+        },
     }
 }
+# тесты (manage.py test и pytest) получают свой файл кэша во временном
+# каталоге, чтобы не читать и не очищать кэш работающего сервера
+if sys.argv[1:2] == ['test'] or 'pytest' in sys.modules:
+    TEST_CACHE_DIR = tempfile.mkdtemp(prefix='yatube-cache-')
+    atexit.register(shutil.rmtree, TEST_CACHE_DIR, ignore_errors=True)
+    CACHES['default']['LOCATION'] = os.path.join(
+        TEST_CACHE_DIR, 'cache.sqlite3'
+    )
 
 from .local_settings import *
\ No newline at end of file